@@ -1,13 +1,18 @@
 import os
 from datetime import timedelta
-from fastapi import APIRouter, HTTPException, Depends, status
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, status, Header, Query
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from fastapi_jwt_auth import AuthJWT
 import models, schemas, database
+from revocation import revoke_token
+import roster
 
 auth_router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
+MAX_VALIDATE_BATCH = 500
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 ###User signup
@@ -60,6 +65,7 @@ async def signup(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    roster.publish_user(new_user)
 
     return new_user
 
@@ -133,7 +139,9 @@ async def validate_user(Authorize: AuthJWT = Depends()):
             "email": Authorize.get_jwt_subject(),
             "user_id": raw_jwt.get("user_id"),
             "username": raw_jwt.get("username"),
-            "role": raw_jwt.get("role")
+            "role": raw_jwt.get("role"),
+            "jti": raw_jwt.get("jti"),
+            "exp": raw_jwt.get("exp")
         }
 
     except Exception:
@@ -142,6 +150,26 @@ async def validate_user(Authorize: AuthJWT = Depends()):
             detail={"is_valid": False, "message": "Invalid token"}
         )
 
+#logout: revoke the current access token across all services
+@auth_router.post("/logout", status_code=status.HTTP_200_OK)
+async def logout(
+    Authorize: AuthJWT = Depends(),
+    Authorization: Optional[str] = Header(None)
+):
+    try:
+        Authorize.jwt_required()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Please provide a valid access token"
+        )
+
+    raw_jwt = Authorize.get_raw_jwt()
+    token = Authorization[7:] if Authorization.startswith("Bearer ") else Authorization
+    revoke_token(raw_jwt["jti"], raw_jwt["exp"], token)
+
+    return {"message": "Token has been revoked"}
+
 #Get all active users (Admin access)
 @auth_router.get("/users")
 async def get_users(
@@ -179,6 +207,45 @@ async def get_users(
     return response
 
 
+##validate several users in one call (e.g. /validate-users?ids=1,2,3)
+@auth_router.get("/validate-users", response_model=list[schemas.UserValidationOut])
+async def validate_users(
+    ids: str = Query(..., example="1,2,3"),
+    Authorize: AuthJWT = Depends(),
+    db: Session = Depends(database.get_db)
+):
+    try:
+        Authorize.jwt_required()
+    except Exception:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    claims = Authorize.get_raw_jwt()
+    if claims.get("role") not in ["ADMIN", "STAFF"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    try:
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in ids.split(",") if user_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+    if not user_ids or len(user_ids) > MAX_VALIDATE_BATCH:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_VALIDATE_BATCH} user ids are allowed")
+
+    users = db.query(models.User).filter(models.User.id.in_(user_ids)).all()
+
+    # Unknown ids are left out, callers compare against what they asked for
+    return [
+        {
+            "user_id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "role": user.role.value,
+            "is_active": user.is_active,
+            "is_valid_delivery_person": user.role.value == "DELIVERY" and user.is_active
+        }
+        for user in users
+    ]
+
+
 ##validate user by id
 @auth_router.get("/validate-user/{user_id}", response_model=schemas.UserValidationOut)
 async def validate_user_by_id(
@@ -1,9 +1,17 @@
 from pydantic import BaseSettings
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
     authjwt_secret_key: str = os.getenv('SECRET_KEY')
     authjwt_algorithm: str = os.getenv('JWT_ALGORITHM')
+    # With an asymmetric JWT_ALGORITHM (e.g. RS256) tokens are signed with the private key
+    # and the other services only need the public key to verify them
+    authjwt_private_key: Optional[str] = os.getenv('JWT_PRIVATE_KEY')
+    authjwt_public_key: Optional[str] = os.getenv('JWT_PUBLIC_KEY')
+    # Revoked access tokens are rejected here too (see revocation.py)
+    authjwt_denylist_enabled: bool = True
+    authjwt_denylist_token_checks: set = {"access"}
 
     class Config:
         env_file = ".env"  # Optional: if you're using an .env file for environment variables
@@ -1,13 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi_jwt_auth import AuthJWT
 import auth_routes
 from config import Settings
+from revocation import is_revoked
+import database
+import roster
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ✅ Publish the delivery roster that delivery-service replicates
+    db = database.SessionLocal()
+    try:
+        roster.rebuild(db)
+    except Exception as e:
+        print(f"🔥 Delivery roster rebuild failed: {e}")
+    finally:
+        db.close()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 
 @AuthJWT.load_config
 def get_config():
     return Settings()
 
+@AuthJWT.token_in_denylist_loader
+def check_if_token_in_denylist(decrypted_token):
+    return is_revoked(decrypted_token["jti"])
+
 app.include_router(auth_routes.auth_router)
@@ -0,0 +1,34 @@
+import hashlib
+import json
+import time
+from redis_client import redis_client
+
+# Keys and channel shared with the AuthMiddleware token cache of the other services
+REVOCATION_CHANNEL = "auth:revocations"
+REVOKED_KEY = "auth:revoked:{jti}"
+SHARED_TOKEN_KEY = "auth:token:{digest}"
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def is_revoked(jti: str) -> bool:
+    try:
+        return bool(redis_client.exists(REVOKED_KEY.format(jti=jti)))
+    except Exception as e:
+        # Fail open like the other services: a Redis outage must not log every user out
+        print(f"[Revocation] Revocation check failed: {e}")
+        return False
+
+
+# ✅ Denylist the token until it expires and tell every service to drop it from its cache
+def revoke_token(jti: str, exp: int, token: str):
+    digest = token_digest(token)
+    ttl = max(int(exp - time.time()), 1)
+
+    pipe = redis_client.pipeline()
+    pipe.set(REVOKED_KEY.format(jti=jti), 1, ex=ttl)
+    pipe.delete(SHARED_TOKEN_KEY.format(digest=digest))
+    pipe.publish(REVOCATION_CHANNEL, json.dumps({"jti": jti, "digest": digest}))
+    pipe.execute()
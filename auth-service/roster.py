@@ -0,0 +1,70 @@
+# roster.py
+#
+# Publishes the active DELIVERY users to Redis so delivery-service can keep a local
+# roster of drivers (delivery-service/roster.py) without calling this service. The
+# hash holds the full roster; every change bumps the version and is announced on the
+# channel. A replica that sees a gap in versions reloads the hash.
+#
+# Signup is the only route that creates users or sets their role and active state, so
+# it is the only caller of publish_user; any new route that changes either must call
+# it too. Users changed outside the API (SQL, admin scripts) reach the roster only on
+# the next rebuild, at startup or with: python roster.py
+
+import json
+import database
+import models
+from redis_client import redis_client
+
+ROSTER_KEY = "auth:delivery_roster"
+VERSION_KEY = "auth:delivery_roster:version"
+CHANGES_CHANNEL = "auth:roster_changes"
+
+
+def _is_driver(user: models.User) -> bool:
+    return user.role == models.UserRole.DELIVERY and bool(user.is_active)
+
+
+def _record(user: models.User) -> dict:
+    return {"username": user.username}
+
+
+def rebuild(db):
+    """Replace the roster with what is in the DB (run at startup)."""
+    drivers = db.query(models.User).filter(
+        models.User.role == models.UserRole.DELIVERY, models.User.is_active == True
+    ).all()
+    records = {str(user.id): json.dumps(_record(user)) for user in drivers}
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(ROSTER_KEY)
+    if records:
+        pipe.hset(ROSTER_KEY, mapping=records)
+    pipe.incr(VERSION_KEY)
+    version = pipe.execute()[-1]
+    redis_client.publish(CHANGES_CHANNEL, json.dumps({"version": version, "reset": True}))
+    print(f"✅ Delivery roster v{version} published with {len(records)} drivers")
+
+
+def publish_user(user: models.User):
+    """Write one user's change through to the roster; non-drivers are removed from it."""
+    upserts = {str(user.id): _record(user)} if _is_driver(user) else {}
+    deletes = [] if upserts else [str(user.id)]
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        for user_id in deletes:
+            pipe.hdel(ROSTER_KEY, user_id)
+        for user_id, record in upserts.items():
+            pipe.hset(ROSTER_KEY, user_id, json.dumps(record))
+        pipe.incr(VERSION_KEY)
+        version = pipe.execute()[-1]
+        redis_client.publish(CHANGES_CHANNEL, json.dumps({"version": version, "upserts": upserts, "deletes": deletes}))
+    except Exception as e:
+        # Replicas reload on the next version gap
+        print(f"🔥 Delivery roster update failed: {e}")
+
+
+if __name__ == "__main__":
+    db = database.SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
@@ -0,0 +1,129 @@
+# assignment.py
+#
+# Assigns PENDING deliveries to the least-loaded drivers on the roster, in batches.
+# A driver's load is their count of DISPATCHED / IN_TRANSIT deliveries; drivers at
+# DELIVERY_MAX_LOAD are skipped. One worker at a time runs a batch (Postgres advisory
+# lock), so loads read at the start of a batch stay accurate while it assigns.
+
+import heapq
+import os
+import threading
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import func, text
+import models, database
+import etag
+import status_events
+import outbox_relay
+import tracking
+from roster import roster
+
+DELIVERY_MAX_LOAD = int(os.getenv("DELIVERY_MAX_LOAD", 3))
+AUTO_ASSIGN_BATCH_SIZE = int(os.getenv("AUTO_ASSIGN_BATCH_SIZE", 100))
+# Seconds between background runs; 0 leaves assignment to POST /auto-assign
+AUTO_ASSIGN_INTERVAL = float(os.getenv("AUTO_ASSIGN_INTERVAL", 0))
+
+ASSIGN_LOCK_ID = 72001
+ACTIVE_STATUSES = (models.DeliveryStatus.DISPATCHED, models.DeliveryStatus.IN_TRANSIT)
+
+_stop = threading.Event()
+_thread = None
+
+
+def driver_loads(db) -> dict:
+    rows = db.query(models.Delivery.delivery_person_id, func.count(models.Delivery.id)).filter(
+        models.Delivery.delivery_person_id.isnot(None),
+        models.Delivery.status.in_(ACTIVE_STATUSES)
+    ).group_by(models.Delivery.delivery_person_id).all()
+    return dict(rows)
+
+
+def assign_pending(limit: int = AUTO_ASSIGN_BATCH_SIZE) -> List[models.Delivery]:
+    """Dispatch up to `limit` of the oldest unassigned deliveries; returns what was assigned."""
+    drivers = roster.driver_ids()
+    if not drivers:
+        return []
+
+    # Assigned rows are returned after commit without reloading them one by one
+    db = database.SessionLocal(expire_on_commit=False)
+    try:
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ASSIGN_LOCK_ID}).scalar():
+            # Another worker is assigning right now
+            return []
+
+        loads = driver_loads(db)
+        heap = [(loads.get(driver, 0), driver) for driver in drivers if loads.get(driver, 0) < DELIVERY_MAX_LOAD]
+        heapq.heapify(heap)
+        if not heap:
+            db.commit()
+            return []
+
+        pending = (
+            db.query(models.Delivery)
+            .filter(models.Delivery.status == models.DeliveryStatus.PENDING,
+                    models.Delivery.delivery_person_id.is_(None))
+            .order_by(models.Delivery.id)
+            .limit(min(limit, sum(DELIVERY_MAX_LOAD - load for load, _ in heap)))
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+        now = datetime.utcnow()
+        assigned = []
+        for delivery in pending:
+            if not heap:
+                break
+            load, driver = heapq.heappop(heap)
+            delivery.delivery_person_id = driver
+            delivery.status = models.DeliveryStatus.DISPATCHED
+            delivery.assigned_at = now
+            delivery.updated_at = now
+            # Rows are locked FOR UPDATE, so no other writer can bump it meanwhile
+            delivery.status_version += 1
+            status_events.stage(db, delivery)
+            assigned.append(delivery)
+            if load + 1 < DELIVERY_MAX_LOAD:
+                heapq.heappush(heap, (load + 1, driver))
+
+        db.commit()
+        if assigned:
+            outbox_relay.wake()
+        for delivery in assigned:
+            etag.stamp("delivery", delivery.order_uid, delivery.id, delivery.updated_at)
+            tracking.publish(delivery)
+        if assigned:
+            print(f"🛵 Auto-assigned {len(assigned)} deliveries to {len({d.delivery_person_id for d in assigned})} drivers")
+        return assigned
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_auto_assign():
+    print(f"✅ Auto-assignment running every {AUTO_ASSIGN_INTERVAL}s")
+    while not _stop.wait(AUTO_ASSIGN_INTERVAL):
+        try:
+            # A full batch means more are waiting, so go again straight away
+            while len(assign_pending()) >= AUTO_ASSIGN_BATCH_SIZE and not _stop.is_set():
+                pass
+        except Exception as e:
+            print(f"🔥 Auto-assignment error: {e}")
+    print("🔒 Auto-assignment stopped")
+
+
+def start_auto_assign():
+    global _thread
+    if AUTO_ASSIGN_INTERVAL <= 0:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=run_auto_assign, daemon=True)
+    _thread.start()
+
+
+def stop_auto_assign():
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=15)
@@ -1,11 +1,27 @@
 # delivery_consumer.py
+#
+# Consumes new_order_topic in batches: one multi-row INSERT ... ON CONFLICT DO NOTHING
+# per batch, and offsets are committed only after the DB commit, so a crash or a DB
+# error replays the batch instead of losing it, and replays never duplicate deliveries.
+#
+# Messages that can never be processed (bad JSON, no order_uid) go straight to the
+# dead-letter topic. Batches that fail on the DB are handed to tiered retry topics and
+# come back after DELIVERY_RETRY_DELAYS seconds, then to the dead-letter topic once
+# every tier is used up; replay_dlq.py puts dead letters back on new_order_topic.
+#
+# DELIVERY_CONSUMER_WORKERS consumers join delivery-service-group and split the topic's
+# partitions between them; more workers than partitions just leaves some idle.
+# Run standalone with: python delivery_consumer.py
 
 import json
+import signal
 import threading
-from confluent_kafka import Consumer
-from sqlalchemy.orm import Session
+import time
 from datetime import datetime
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+from sqlalchemy.dialects.postgresql import insert
 import models, database
+from kafka_producer import publish
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -14,50 +30,276 @@ load_dotenv()
 KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
 DELIVERY_TOPIC = "new_order_topic"
 GROUP_ID = "delivery-service-group"
+DLQ_TOPIC = f"{DELIVERY_TOPIC}.dlq"
 
-def start_delivery_consumer():
-    def consume():
-        consumer = Consumer({
-            'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
-            'group.id': GROUP_ID,
-            'auto.offset.reset': 'earliest',
-            'enable.auto.commit': True
-        })
+# One retry topic per delay, e.g. new_order_topic.retry.30s
+RETRY_DELAYS = [int(delay) for delay in os.getenv("DELIVERY_RETRY_DELAYS", "5,30,300").split(",") if delay.strip()]
+RETRY_TOPICS = [f"{DELIVERY_TOPIC}.retry.{delay}s" for delay in RETRY_DELAYS]
 
-        consumer.subscribe([DELIVERY_TOPIC])
-        print(f"✅ Kafka Consumer started, listening to topic: {DELIVERY_TOPIC}")
+CONSUMER_BATCH_SIZE = int(os.getenv("DELIVERY_CONSUMER_BATCH_SIZE", 500))
+CONSUMER_BATCH_TIMEOUT = float(os.getenv("DELIVERY_CONSUMER_BATCH_TIMEOUT", 1.0))
+CONSUMER_RETRY_BACKOFF = float(os.getenv("DELIVERY_CONSUMER_RETRY_BACKOFF", 2.0))
+CONSUMER_WORKERS = int(os.getenv("DELIVERY_CONSUMER_WORKERS", 1))
+CONSUMER_LAG_INTERVAL = float(os.getenv("DELIVERY_CONSUMER_LAG_INTERVAL", 10.0))
 
+_stop = threading.Event()
+_threads = []
+_lag_lock = threading.Lock()
+_lag = {}  # worker id -> {"topic[partition]": lag}
+_counters = {"retried": 0, "dead_lettered": 0}
+
+
+def header(msg, name: str):
+    for key, value in msg.headers() or []:
+        if key == name:
+            return value.decode() if value is not None else None
+    return None
+
+
+def parse_order(msg) -> str:
+    """order_uid of a message; ValueError means no retry will ever make it readable."""
+    try:
+        data = json.loads(msg.value().decode("utf-8"))
+    except (AttributeError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"unreadable payload: {e}")
+    if not isinstance(data, dict) or not data.get("order_uid"):
+        raise ValueError("missing order_uid")
+    return str(data["order_uid"])
+
+
+def forward(msg, topic: str, error: str, attempt: int, not_before: float = None) -> tuple:
+    """A copy of msg for a retry or dead-letter topic, remembering where it first came from."""
+    headers = [
+        ("x-original-topic", header(msg, "x-original-topic") or msg.topic()),
+        ("x-original-partition", header(msg, "x-original-partition") or str(msg.partition())),
+        ("x-original-offset", header(msg, "x-original-offset") or str(msg.offset())),
+        ("x-error", error),
+        ("x-failed-at", datetime.utcnow().isoformat()),
+        ("x-retry-attempt", str(attempt)),
+    ]
+    if not_before is not None:
+        headers.append(("x-retry-not-before", str(not_before)))
+    return topic, msg.key(), msg.value(), headers
+
+
+def dead_letter(msg, error: str) -> tuple:
+    with _lag_lock:
+        _counters["dead_lettered"] += 1
+    print(f"☠️ Dead-lettering {msg.topic()}[{msg.partition()}]@{msg.offset()}: {error}")
+    return forward(msg, DLQ_TOPIC, error, int(header(msg, "x-retry-attempt") or 0))
+
+
+def retry_later(msg, error: str) -> tuple:
+    attempt = int(header(msg, "x-retry-attempt") or 0)
+    if attempt >= len(RETRY_TOPICS):
+        return dead_letter(msg, f"retries exhausted: {error}")
+    with _lag_lock:
+        _counters["retried"] += 1
+    return forward(msg, RETRY_TOPICS[attempt], error, attempt + 1, time.time() + RETRY_DELAYS[attempt])
+
+
+def insert_deliveries(order_uids: list) -> int:
+    """Create a PENDING delivery per order in one statement; orders seen before are ignored."""
+    if not order_uids:
+        return 0
+
+    db = database.SessionLocal()
+    try:
+        result = db.execute(
+            insert(models.Delivery)
+            .values([{"order_uid": order_uid, "status": models.DeliveryStatus.PENDING} for order_uid in order_uids])
+            .on_conflict_do_nothing(index_elements=["order_uid"])
+        )
+        db.commit()
+        return result.rowcount
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def rewind(consumer, messages):
+    """Seek every partition in the batch back to its first message so the batch is redelivered."""
+    first_offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        first_offsets[key] = min(first_offsets.get(key, msg.offset()), msg.offset())
+    for (topic, partition), offset in first_offsets.items():
+        consumer.seek(TopicPartition(topic, partition, offset))
+
+
+def store_offsets(consumer, messages):
+    """Mark messages as done; commits only ever cover stored offsets."""
+    next_offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        next_offsets[key] = max(next_offsets.get(key, 0), msg.offset() + 1)
+    if next_offsets:
+        consumer.store_offsets(offsets=[
+            TopicPartition(topic, partition, offset) for (topic, partition), offset in next_offsets.items()
+        ])
+
+
+def process_batch(consumer, messages, paused: dict):
+    records = [msg for msg in messages if not msg.error()]
+    for msg in messages:
+        if msg.error():
+            print(f"❌ Kafka error: {msg.error()}")
+    if not records:
+        return
+
+    # Retry topics hold messages in due order, so the first one that is not due yet
+    # parks the rest of its partition until then
+    now = time.time()
+    deferred = {}  # (topic, partition) -> (offset, not_before)
+    handled, orders, forwards = [], [], []
+    for msg in records:
+        key = (msg.topic(), msg.partition())
+        if key in deferred:
+            continue
+        not_before = float(header(msg, "x-retry-not-before") or 0)
+        if not_before > now:
+            deferred[key] = (msg.offset(), not_before)
+            continue
+
+        handled.append(msg)
         try:
-            while True:
-                msg = consumer.poll(1.0)
-                if msg is None:
-                    continue
-                if msg.error():
-                    print(f"❌ Kafka error: {msg.error()}")
-                    continue
+            orders.append((msg, parse_order(msg)))
+        except ValueError as e:
+            forwards.append(dead_letter(msg, str(e)))
+
+    created = 0
+    try:
+        created = insert_deliveries(list(dict.fromkeys(order_uid for _, order_uid in orders)))
+    except Exception as e:
+        print(f"🔥 Delivery batch of {len(orders)} orders failed, sending to retry: {e}")
+        forwards += [retry_later(msg, str(e)) for msg, _ in orders]
+
+    if forwards and not publish(forwards):
+        # Nothing may be dropped, so without Kafka to hand off to the batch is replayed
+        print(f"🔥 Retry/dead-letter hand-off failed, replaying batch in {CONSUMER_RETRY_BACKOFF}s")
+        rewind(consumer, records)
+        time.sleep(CONSUMER_RETRY_BACKOFF)
+        return
 
+    for (topic, partition), (offset, not_before) in deferred.items():
+        tp = TopicPartition(topic, partition, offset)
+        consumer.pause([tp])
+        consumer.seek(tp)
+        paused[(topic, partition)] = not_before
+
+    store_offsets(consumer, handled)
+    # Offsets are flushed synchronously when partitions are revoked or the worker stops
+    consumer.commit(asynchronous=True)
+    print(f"✅ Delivery batch: {created} created from {len(handled)} messages")
+
+
+def resume_due(consumer, paused: dict):
+    now = time.time()
+    for (topic, partition), not_before in list(paused.items()):
+        if not_before <= now:
+            consumer.resume([TopicPartition(topic, partition)])
+            del paused[(topic, partition)]
+
+
+def commit_offsets(consumer):
+    try:
+        consumer.commit(asynchronous=False)
+    except KafkaException as e:
+        # Nothing consumed since the last commit
+        print(f"ℹ️ Offset commit skipped: {e}")
+
+
+def report_lag(worker_id: str, consumer):
+    lag = {}
+    for tp in consumer.position(consumer.assignment()):
+        _, high = consumer.get_watermark_offsets(tp, timeout=5.0)
+        # position is negative until the first message of the partition is consumed
+        lag[f"{tp.topic}[{tp.partition}]"] = high - tp.offset if tp.offset >= 0 else None
+    with _lag_lock:
+        _lag[worker_id] = lag
+
+
+def consumer_stats() -> dict:
+    with _lag_lock:
+        return {
+            "workers": len([t for t in _threads if t.is_alive()]),
+            "partitions": {worker_id: dict(lag) for worker_id, lag in _lag.items()},
+            **_counters,
+        }
+
+
+def run_consumer(worker_id: str):
+    consumer = Consumer({
+        'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
+        'group.id': GROUP_ID,
+        'client.id': f"delivery-consumer-{worker_id}",
+        'auto.offset.reset': 'earliest',
+        'enable.auto.commit': False,
+        'enable.auto.offset.store': False
+    })
+    paused = {}  # (topic, partition) -> when its parked retry message is due
+
+    def on_assign(consumer, partitions):
+        print(f"📥 Consumer {worker_id} assigned: {[f'{tp.topic}[{tp.partition}]' for tp in partitions]}")
+
+    def on_revoke(consumer, partitions):
+        # Batches are handled between consume() calls, so every stored offset is already in
+        # the DB or handed off; make sure they land before another worker takes the partitions over
+        print(f"📤 Consumer {worker_id} revoked: {[f'{tp.topic}[{tp.partition}]' for tp in partitions]}")
+        commit_offsets(consumer)
+        for tp in partitions:
+            paused.pop((tp.topic, tp.partition), None)
+        with _lag_lock:
+            _lag.pop(worker_id, None)
+
+    consumer.subscribe([DELIVERY_TOPIC, *RETRY_TOPICS], on_assign=on_assign, on_revoke=on_revoke)
+    print(f"✅ Kafka Consumer {worker_id} started, listening to topic: {DELIVERY_TOPIC}")
+
+    last_lag_report = 0.0
+    try:
+        while not _stop.is_set():
+            messages = consumer.consume(num_messages=CONSUMER_BATCH_SIZE, timeout=CONSUMER_BATCH_TIMEOUT)
+            if messages:
+                process_batch(consumer, messages, paused)
+            resume_due(consumer, paused)
+
+            if time.monotonic() - last_lag_report > CONSUMER_LAG_INTERVAL:
                 try:
-                    data = json.loads(msg.value().decode("utf-8"))
-                    print(f"📦 New order received in delivery-service: {data}")
-
-                    db: Session = next(database.get_db())
-                    new_delivery = models.Delivery(
-                        order_uid=data["order_uid"],
-                        status="PENDING",  # default status
-                        # assigned_at, updated_at are handled by the model defaults
-                    )
-                    db.add(new_delivery)
-                    db.commit()
-                    db.close()
-                    print(f"✅ Delivery entry created for Order UID: {data['order_uid']}")
-
-                except Exception as e:
-                    print(f"🔥 Error processing message: {e}")
-
-        except KeyboardInterrupt:
-            print("🛑 Consumer interrupted manually.")
-        finally:
-            consumer.close()
-            print("🔒 Kafka Consumer closed gracefully.")
-
-    threading.Thread(target=consume, daemon=True).start()
+                    report_lag(worker_id, consumer)
+                except KafkaException as e:
+                    print(f"❌ Lag report failed for consumer {worker_id}: {e}")
+                last_lag_report = time.monotonic()
+    finally:
+        commit_offsets(consumer)
+        consumer.close()
+        with _lag_lock:
+            _lag.pop(worker_id, None)
+        print(f"🔒 Kafka Consumer {worker_id} closed gracefully.")
+
+
+def start_consumer_pool(workers: int = CONSUMER_WORKERS):
+    _stop.clear()
+    for i in range(workers):
+        thread = threading.Thread(target=run_consumer, args=(str(i),), daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop_consumer_pool():
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout=CONSUMER_BATCH_TIMEOUT + 15)
+    _threads.clear()
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    start_consumer_pool()
+    try:
+        while not _stop.wait(CONSUMER_LAG_INTERVAL):
+            print(f"📊 Consumer lag: {consumer_stats()['partitions']}")
+    except KeyboardInterrupt:
+        print("🛑 Consumer pool interrupted manually.")
+    stop_consumer_pool()
@@ -1,35 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
 from sqlalchemy.orm import Session
-from fastapi_jwt_auth import AuthJWT
 from typing import List, Optional
 from datetime import datetime
-import os
 import models
 import schemas
 import database
-import requests
+import httpx
+import etag
+import assignment
+import status_events
+import outbox_relay
+import tracking
+from roster import roster
+from middleware import get_current_user
 
 delivery_router = APIRouter(prefix="/api/v1/delivery", tags=["Delivery"])
 
 
-# --- Utility functions ---
-def get_user_role(Authorize: AuthJWT) -> str:
-    try:
-        Authorize.jwt_required()
-        return Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
-
-
 # --- Routes ---
 
 @delivery_router.post("/create", response_model=schemas.DeliveryOut)
 async def create_delivery(
     delivery_data: schemas.DeliveryCreate,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    role = get_user_role(Authorize)
+    role = user.get("role")
 
     if role not in {"ADMIN", "STAFF"}:
         raise HTTPException(status_code=403, detail="Only staff or admin can create deliveries")
@@ -57,23 +53,19 @@ async def create_delivery(
 async def update_status_by_delivery_person(
     update_data: schemas.DeliveryStatusUpdateIn,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_id = Authorize.get_raw_jwt().get("user_id")
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_id = user.get("user_id")
+    role = user.get("role")
 
     if role != "DELIVERY":
         raise HTTPException(status_code=403, detail="Only Delivery Person can update the status")
 
-    # Find delivery and verify ownership
+    # Find delivery and verify ownership; locked so status_version can't be bumped twice at once
     delivery = db.query(models.Delivery).filter(
         models.Delivery.delivery_uid == update_data.delivery_uid,
         models.Delivery.delivery_person_id == user_id
-    ).first()
+    ).with_for_update().first()
 
     if not delivery:
         raise HTTPException(status_code=404, detail="Delivery not found or not assigned to you")
@@ -81,9 +73,14 @@ async def update_status_by_delivery_person(
     # Update status
     delivery.status = update_data.status
     delivery.updated_at = datetime.utcnow()
+    delivery.status_version += 1
+    status_events.stage(db, delivery)
 
     db.commit()
     db.refresh(delivery)
+    outbox_relay.wake()
+    etag.stamp("delivery", delivery.order_uid, delivery.id, delivery.updated_at)
+    tracking.publish(delivery)
 
     return delivery
 
@@ -91,11 +88,11 @@ async def update_status_by_delivery_person(
 @delivery_router.get("/{identifier}", response_model=schemas.DeliveryOut)
 async def get_delivery(
     identifier: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    get_user_role(Authorize)
-
     if identifier.isdigit():
         delivery = db.query(models.Delivery).filter(models.Delivery.id == int(identifier)).first()
     else:
@@ -104,15 +101,20 @@ async def get_delivery(
     if not delivery:
         raise HTTPException(status_code=404, detail="Delivery not found")
 
+    delivery_etag = etag.version_etag(delivery.id, delivery.updated_at)
+    if etag.is_not_modified(request, delivery_etag, delivery.updated_at):
+        return etag.not_modified(delivery_etag, delivery.updated_at)
+
+    etag.set_headers(response, delivery_etag, delivery.updated_at)
     return delivery
 
 ##get all deliveries
 @delivery_router.get("/", response_model=List[schemas.DeliveryOut])
 async def get_all_deliveries(
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    role = get_user_role(Authorize)
+    role = user.get("role")
 
     if role != "ADMIN":
         raise HTTPException(status_code=403, detail="Only admins can access all deliveries")
@@ -123,15 +125,26 @@ async def get_all_deliveries(
 @delivery_router.get("/order/{order_uid}", response_model=schemas.DeliveryOut)
 async def get_delivery_by_order_uid(
     order_uid: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    get_user_role(Authorize)
+    # ✅ Pollers that already have the latest version never reach the DB
+    current = etag.stamp_matches(request, "delivery", order_uid)
+    if current:
+        return etag.not_modified(current)
 
     delivery = db.query(models.Delivery).filter(models.Delivery.order_uid == order_uid).first()
     if not delivery:
         raise HTTPException(status_code=404, detail="Delivery not found for this order")
 
+    delivery_etag = etag.version_etag(delivery.id, delivery.updated_at)
+    etag.remember("delivery", order_uid, delivery.id, delivery.updated_at)
+    if etag.is_not_modified(request, delivery_etag, delivery.updated_at):
+        return etag.not_modified(delivery_etag, delivery.updated_at)
+
+    etag.set_headers(response, delivery_etag, delivery.updated_at)
     return delivery
 
 
@@ -139,9 +152,9 @@ async def get_delivery_by_order_uid(
 async def delete_delivery(
     delivery_id: int,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    role = get_user_role(Authorize)
+    role = user.get("role")
 
     if role != "ADMIN":
         raise HTTPException(status_code=403, detail="Only admins can delete deliveries")
@@ -152,22 +165,33 @@ async def delete_delivery(
 
     db.delete(delivery)
     db.commit()
+    etag.forget("delivery", delivery.order_uid)
     return {"detail": "Delivery deleted successfully"}
 
+##auto-assign pending deliveries to the least-loaded drivers
+@delivery_router.post("/auto-assign", response_model=List[schemas.DeliveryOut])
+async def auto_assign_deliveries(
+    limit: int = Query(assignment.AUTO_ASSIGN_BATCH_SIZE, ge=1, le=1000),
+    user: dict = Depends(get_current_user)
+):
+    role = user.get("role")
+
+    if role not in ["ADMIN", "STAFF"]:
+        raise HTTPException(status_code=403, detail="Only Admin or Staff can assign delivery persons")
+
+    return assignment.assign_pending(limit)
+
+
 ##assing delivery person to delivery order
 @delivery_router.put("/assign", response_model=schemas.DeliveryOut)
 async def assign_delivery_person(
     assign_data: schemas.DeliveryAssignIn,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: dict = Depends(get_current_user),
     Authorization: Optional[str] = Header(None)
 ):
     # Step 1: Auth check
-    try:
-        Authorize.jwt_required()
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    role = user.get("role")
 
     if role not in ["ADMIN", "STAFF"]:
         raise HTTPException(status_code=403, detail="Only Admin or Staff can assign delivery person to delivery. ")
@@ -183,29 +207,31 @@ async def assign_delivery_person(
     if assign_data.status != "DISPATCHED":
         raise HTTPException(status_code=400, detail="Only DISPATCHED status allowed for assignment")
 
-    # Step 3: Validate delivery person
-    auth_service_url = os.getenv("USER_SERVICE_BASE_URL", "http://127.0.0.1:8001")
-    validate_url = f"{auth_service_url}/api/v1/auth/validate-user/{assign_data.delivery_person_id}"
-
+    # Step 3: Validate delivery person, from the local roster unless it doesn't know them
     headers = {"Authorization": f"{Authorization}"}
 
     try:
-        response = requests.get(validate_url, headers=headers, timeout=5)
-        print(response)
-        if response.status_code != 200 or not response.json().get("is_valid_delivery_person", False):
-            raise HTTPException(status_code=400, detail="Invalid or inactive delivery person")
-    except requests.RequestException:
+        valid = await roster.validate([assign_data.delivery_person_id], headers)
+    except httpx.HTTPError:
         raise HTTPException(status_code=503, detail="Auth service unavailable")
+    if not valid[assign_data.delivery_person_id]:
+        raise HTTPException(status_code=400, detail="Invalid or inactive delivery person")
 
-    # Step 4: Assign person & update
+    # Step 4: Assign person & update, with the row locked so status_version can't be bumped twice at once
+    db.refresh(delivery, with_for_update=True)
     if delivery.delivery_person_id is None:
         delivery.assigned_at = datetime.utcnow()
     delivery.delivery_person_id = assign_data.delivery_person_id
     delivery.status = assign_data.status
     delivery.updated_at = datetime.utcnow()
+    delivery.status_version += 1
+    status_events.stage(db, delivery)
 
     db.commit()
     db.refresh(delivery)
+    outbox_relay.wake()
+    etag.stamp("delivery", delivery.order_uid, delivery.id, delivery.updated_at)
+    tracking.publish(delivery)
 
     return delivery
 
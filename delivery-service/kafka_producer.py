@@ -0,0 +1,62 @@
+from confluent_kafka import Producer, KafkaException
+import os
+
+# Kafka configuration for the retry and dead-letter hand-offs of delivery_consumer.py
+# and the status events drained by outbox_relay.py
+kafka_config = {
+    'bootstrap.servers': os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092"),
+    'enable.idempotence': True,
+    'linger.ms': int(os.getenv("KAFKA_LINGER_MS", 20)),
+}
+
+# Create Kafka producer instance
+producer = Producer(kafka_config)
+
+
+# Produce (topic, key, value, headers) records, True once the broker acknowledged all of them
+def publish(records, timeout: float = 10.0) -> bool:
+    acked = []
+
+    def delivery_report(err, msg):
+        if err is not None:
+            print(f"❌ Delivery failed to {msg.topic()}: {err}")
+        else:
+            acked.append(msg)
+
+    try:
+        for topic, key, value, headers in records:
+            producer.produce(topic=topic, key=key, value=value, headers=headers, callback=delivery_report)
+            producer.poll(0)  # Serve delivery callbacks while producing
+    except (BufferError, KafkaException) as e:
+        print(f"❌ Produce failed: {e}")
+        return False
+
+    producer.flush(timeout)
+    return len(acked) == len(records)
+
+
+# Produce a batch of outbox rows, return the ids the broker acknowledged
+def publish_events(events, timeout: float = 10.0) -> list:
+    delivered = []
+
+    def delivery_report(err, msg, event_id):
+        if err is not None:
+            print(f"❌ Delivery failed for key {msg.key().decode()}: {err}")
+        else:
+            delivered.append(event_id)
+
+    try:
+        for event in events:
+            producer.produce(
+                topic=event.topic,
+                key=event.event_key,
+                value=event.payload,
+                callback=lambda err, msg, event_id=event.id: delivery_report(err, msg, event_id)
+            )
+            producer.poll(0)  # Serve delivery callbacks while producing
+    except (BufferError, KafkaException) as e:
+        # Whatever was not acknowledged stays in the outbox for the next round
+        print(f"❌ Produce failed: {e}")
+
+    producer.flush(timeout)
+    return delivered
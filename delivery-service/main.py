@@ -1,17 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+import os
 from fastapi_jwt_auth import AuthJWT
 import delivery_routes
 from config import Settings
 from middleware import AuthMiddleware
-from delivery_consumer import start_delivery_consumer
+import http_client
+from token_cache import start_revocation_listener
+import delivery_consumer
+import assignment
+from roster import start_roster_listener
+from outbox_relay import start_outbox_relay, stop_outbox_relay
 
-app = FastAPI()
+# Set to "false" when the consumers run as their own process (python delivery_consumer.py)
+DELIVERY_CONSUMER_IN_PROCESS = os.getenv("DELIVERY_CONSUMER_IN_PROCESS", "true").lower() == "true"
+# Likewise for the status event relay (python outbox_relay.py)
+OUTBOX_RELAY_IN_PROCESS = os.getenv("OUTBOX_RELAY_IN_PROCESS", "true").lower() == "true"
 
-start_delivery_consumer()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_revocation_listener()
+    start_roster_listener()
+    await http_client.startup()
+    if OUTBOX_RELAY_IN_PROCESS:
+        start_outbox_relay()
+    if DELIVERY_CONSUMER_IN_PROCESS:
+        delivery_consumer.start_consumer_pool()
+    assignment.start_auto_assign()
+    yield
+    assignment.stop_auto_assign()
+    if DELIVERY_CONSUMER_IN_PROCESS:
+        delivery_consumer.stop_consumer_pool()
+    if OUTBOX_RELAY_IN_PROCESS:
+        stop_outbox_relay()
+    await http_client.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @AuthJWT.load_config
 def get_config():
     return Settings()
 
 app.add_middleware(AuthMiddleware)
-app.include_router(delivery_routes.delivery_router)
\ No newline at end of file
+app.include_router(delivery_routes.delivery_router)
+
+
+# ✅ Circuit breaker state and counters per upstream dependency
+@app.get("/health/upstreams", tags=["health"])
+async def upstream_health():
+    return http_client.upstream_stats()
+
+
+# ✅ Consumer pool size and per-partition lag on new_order_topic
+@app.get("/health/consumer", tags=["health"])
+async def consumer_health():
+    return delivery_consumer.consumer_stats()
@@ -1,17 +1,27 @@
 from dotenv import load_dotenv
 import os
-import requests
+import httpx
+import jwt
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
-from fastapi import status
+from fastapi import status, HTTPException
 from starlette.requests import Request
+from config import Settings
+import http_client
+from token_cache import token_cache, token_digest, shared_get, shared_put, is_revoked
 
 # Load environment variables
 load_dotenv()
+settings = Settings()
+
+# "local" verifies JWTs in-process, "remote" asks auth-service /validate
+AUTH_VALIDATION_MODE = os.getenv("AUTH_VALIDATION_MODE", "local")
+
+
 class AuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         try:
-            excluded_paths = ["/docs", "/redoc", "/openapi.json", "/favicon.ico"]
+            excluded_paths = ["/docs", "/redoc", "/openapi.json", "/favicon.ico", "/health"]
             if any(request.url.path.startswith(path) for path in excluded_paths):
                 return await call_next(request)
 
@@ -46,20 +56,74 @@ class AuthMiddleware(BaseHTTPMiddleware):
             )
 
     async def is_valid_token(self, token: str):
-        import os
-        import requests
-        from fastapi import status
-        print(os.getenv("USER_SERVICE_BASE_URL"))
-        user_service_url = os.getenv("USER_SERVICE_BASE_URL", "http://127.0.0.1:8001") + "/api/v1/auth/validate"
+        # Repeat calls with the same bearer token are answered from memory
+        digest = token_digest(token)
+        claims = token_cache.get(digest)
+        if claims is not None:
+            return True, claims
+
+        if AUTH_VALIDATION_MODE == "remote":
+            claims = await self.validate_remote(token, digest)
+        else:
+            claims = self.validate_local(token)
+
+        if claims is None or is_revoked(claims.get("jti")):
+            return False, None
+
+        token_cache.put(digest, claims)
+        return True, claims
+
+    def validate_local(self, token: str):
+        # Verify signature and expiry locally instead of calling auth-service.
+        # With an asymmetric algorithm (e.g. RS256) only the public key is needed.
+        algorithm = settings.authjwt_algorithm or "HS256"
+        key = settings.authjwt_secret_key if algorithm.startswith("HS") else settings.authjwt_public_key
+
+        try:
+            claims = jwt.decode(token, key, algorithms=[algorithm])
+        except jwt.PyJWTError as e:
+            print(f"[AuthMiddleware] Token validation failed: {e}")
+            return None
+
+        if claims.get("type") != "access":
+            return None
+        return claims
+
+    async def validate_remote(self, token: str, digest: str):
+        claims = shared_get(digest)
+        if claims is not None:
+            return claims
+
         headers = {"Authorization": f"Bearer {token}"}
 
         try:
-            response = requests.get(user_service_url, headers=headers, timeout=5)
-            print("AuthService response:", response.status_code, response.text)
-            if response.status_code == status.HTTP_200_OK:
-                data = response.json()
-                return data.get("is_valid", False), data.get("user")
-            return False, None
-        except requests.exceptions.RequestException as e:
+            response = await http_client.get("auth", "/api/v1/auth/validate", headers=headers)
+        except httpx.HTTPError as e:
             print(f"[AuthMiddleware] Token validation exception: {e}")
-            return False, None
+            return None
+
+        if response.status_code != status.HTTP_200_OK:
+            return None
+        data = response.json()
+        if not data.get("is_valid", False):
+            return None
+
+        claims = {
+            "sub": data.get("email"),
+            "user_id": data.get("user_id"),
+            "username": data.get("username"),
+            "role": data.get("role"),
+            "jti": data.get("jti"),
+            "exp": data.get("exp"),
+            "type": "access"
+        }
+        shared_put(digest, claims)
+        return claims
+
+
+# ✅ Claims decoded by AuthMiddleware, so routes don't decode the token again
+def get_current_user(request: Request) -> dict:
+    user = getattr(request.state, "user", None)
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized access")
+    return user
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, Index
 from datetime import datetime
 from database import Base
 import enum
@@ -21,3 +21,22 @@ class Delivery(Base):
     status = Column(Enum(DeliveryStatus), default=DeliveryStatus.PENDING)
     assigned_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped on every status change; order-service ignores events older than what it has applied
+    status_version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+# Status events written in the same transaction as the delivery, drained to Kafka by outbox_relay.py
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, nullable=False)
+    event_key = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Keeps the relay's "oldest unsent first" scan cheap however large the table gets
+        Index("ix_outbox_unsent", "id", postgresql_where=sent_at.is_(None)),
+    )
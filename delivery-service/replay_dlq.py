@@ -0,0 +1,61 @@
+# replay_dlq.py
+#
+# Re-injects dead-lettered delivery events into the topic they originally came from,
+# once whatever made them fail has been fixed. Offsets on the dead-letter topic are
+# committed only after the broker acknowledged the replayed copies.
+# Usage: python replay_dlq.py [--limit N] [--dry-run]
+
+import argparse
+from confluent_kafka import Consumer
+from delivery_consumer import KAFKA_BOOTSTRAP_SERVERS, DELIVERY_TOPIC, DLQ_TOPIC, header
+from kafka_producer import publish
+
+REPLAY_GROUP_ID = "delivery-dlq-replay"
+
+
+def replay(limit: int = None, dry_run: bool = False, idle_timeout: float = 5.0) -> int:
+    consumer = Consumer({
+        'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
+        'group.id': REPLAY_GROUP_ID,
+        'auto.offset.reset': 'earliest',
+        'enable.auto.commit': False
+    })
+    consumer.subscribe([DLQ_TOPIC])
+
+    replayed = 0
+    try:
+        while limit is None or replayed < limit:
+            batch_size = 500 if limit is None else min(500, limit - replayed)
+            messages = [msg for msg in consumer.consume(num_messages=batch_size, timeout=idle_timeout) if not msg.error()]
+            if not messages:
+                break
+
+            for msg in messages:
+                print(f"↩️ {header(msg, 'x-original-topic')}@{header(msg, 'x-original-offset')} "
+                      f"after {header(msg, 'x-retry-attempt')} retries: {header(msg, 'x-error')}")
+            if dry_run:
+                replayed += len(messages)
+                continue
+
+            records = [
+                (header(msg, "x-original-topic") or DELIVERY_TOPIC, msg.key(), msg.value(), [("x-replayed-from", DLQ_TOPIC)])
+                for msg in messages
+            ]
+            if not publish(records):
+                print("❌ Replay stopped: the broker did not acknowledge the batch")
+                break
+            consumer.commit(asynchronous=False)
+            replayed += len(messages)
+    finally:
+        consumer.close()
+
+    print(f"✅ {'Would replay' if dry_run else 'Replayed'} {replayed} dead-lettered messages")
+    return replayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Replay {DLQ_TOPIC} into the original topics")
+    parser.add_argument("--limit", type=int, default=None, help="replay at most this many messages")
+    parser.add_argument("--dry-run", action="store_true", help="list dead letters without replaying or committing")
+    args = parser.parse_args()
+    replay(limit=args.limit, dry_run=args.dry_run)
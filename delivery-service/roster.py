@@ -0,0 +1,119 @@
+# roster.py
+#
+# Local replica of the active delivery persons published by auth-service
+# (auth-service/roster.py), kept in step through its change channel and, in case a
+# change message is lost, a version check every ROSTER_RESYNC_INTERVAL seconds.
+# Ids the replica doesn't know are checked with auth-service's bulk validate-users.
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+import http_client
+from redis_client import redis_client
+
+ROSTER_RESYNC_INTERVAL = float(os.getenv("ROSTER_RESYNC_INTERVAL", 60))
+
+ROSTER_KEY = "auth:delivery_roster"
+VERSION_KEY = "auth:delivery_roster:version"
+CHANGES_CHANNEL = "auth:roster_changes"
+
+
+class Roster:
+    def __init__(self):
+        self.version = 0
+        self._drivers = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hgetall(ROSTER_KEY)
+        pipe.get(VERSION_KEY)
+        records, version = pipe.execute()
+        drivers = {int(user_id): json.loads(record) for user_id, record in records.items()}
+        with self._lock:
+            self._drivers = drivers
+            self.version = int(version or 0)
+        print(f"✅ Delivery roster loaded v{self.version} with {len(drivers)} drivers")
+
+    def apply(self, change: dict):
+        with self._lock:
+            if change["version"] <= self.version:
+                return
+            in_sequence = change["version"] == self.version + 1 and not change.get("reset")
+            if in_sequence:
+                for user_id in change.get("deletes", []):
+                    self._drivers.pop(int(user_id), None)
+                for user_id, record in change.get("upserts", {}).items():
+                    self._drivers[int(user_id)] = record
+                self.version = change["version"]
+        if not in_sequence:
+            self.load()
+
+    def is_driver(self, user_id: int) -> Optional[bool]:
+        """True if the roster lists user_id, None if the caller has to ask auth-service."""
+        return True if user_id in self._drivers else None
+
+    def driver_ids(self) -> List[int]:
+        return list(self._drivers)
+
+    def resync(self):
+        """Reload if the published version moved on without us hearing about it."""
+        version = int(redis_client.get(VERSION_KEY) or 0)
+        if version != self.version:
+            self.load()
+
+    async def validate(self, user_ids: Iterable[int], headers: Dict[str, str]) -> Dict[int, bool]:
+        """Whether each id is an active delivery person, asking auth-service only for unknown ids."""
+        result = {}
+        unknown = []
+        for user_id in dict.fromkeys(user_ids):
+            if self.is_driver(user_id):
+                result[user_id] = True
+            else:
+                unknown.append(user_id)
+        if not unknown:
+            return result
+
+        params = {"ids": ",".join(str(user_id) for user_id in unknown)}
+        response = await http_client.get("auth", "/api/v1/auth/validate-users", params=params, headers=headers)
+        if response.status_code >= 500:
+            raise httpx.HTTPStatusError("validate-users failed", request=response.request, response=response)
+        # Any other refusal leaves the ids unvalidated, as the per-user check did
+        valid = set()
+        if response.status_code == 200:
+            valid = {user["user_id"] for user in response.json() if user.get("is_valid_delivery_person")}
+        for user_id in unknown:
+            result[user_id] = user_id in valid
+        return result
+
+
+roster = Roster()
+
+
+# ✅ Keep the roster in step with auth-service's change stream
+def start_roster_listener():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANGES_CHANNEL)
+                # Subscribe before loading so no change falls between the two
+                roster.load()
+                print(f"✅ Listening for roster changes on: {CHANGES_CHANNEL}")
+                last_resync = time.monotonic()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        roster.apply(json.loads(message["data"]))
+                    if time.monotonic() - last_resync > ROSTER_RESYNC_INTERVAL:
+                        roster.resync()
+                        last_resync = time.monotonic()
+            except Exception as e:
+                print(f"🔥 Roster listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
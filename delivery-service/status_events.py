@@ -0,0 +1,26 @@
+# status_events.py
+#
+# Announces delivery status changes on delivery_status_topic for order-service, which
+# keeps orders.status in step (order-service/delivery_status_consumer.py). Events are
+# staged in the outbox in the same transaction as the change and published by
+# outbox_relay.py. They are keyed by order_uid, so each order's events stay in order on
+# one partition, and carry status_version so replays are harmless.
+
+from datetime import datetime
+
+import outbox_relay
+
+DELIVERY_STATUS_TOPIC = "delivery_status_topic"
+
+
+def stage(db, delivery):
+    """Queue the delivery's new status in the caller's transaction; bump status_version first."""
+    status = delivery.status.value if hasattr(delivery.status, "value") else delivery.status
+    outbox_relay.add_event(db, DELIVERY_STATUS_TOPIC, delivery.order_uid, {
+        "order_uid": delivery.order_uid,
+        "delivery_uid": delivery.delivery_uid,
+        "status": status,
+        "version": delivery.status_version,
+        "delivery_person_id": delivery.delivery_person_id,
+        "at": datetime.utcnow().isoformat(),
+    })
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from redis_client import redis_client
+
+load_dotenv()
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+
+# Shared with auth-service, which publishes here when a token is revoked
+REVOCATION_CHANNEL = "auth:revocations"
+REVOKED_KEY = "auth:revoked:{jti}"
+SHARED_TOKEN_KEY = "auth:token:{digest}"
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """Bounded LRU of validated token digests -> claims.
+
+    Entries expire at the token's own ``exp`` or after ``ttl`` seconds,
+    whichever comes first.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expires_at(self, claims: dict) -> float:
+        expires_at = time.time() + self.ttl
+        if claims.get("exp"):
+            expires_at = min(expires_at, float(claims["exp"]))
+        return expires_at
+
+    def get(self, digest: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def put(self, digest: str, claims: dict):
+        with self._lock:
+            self._entries[digest] = (claims, self.expires_at(claims))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, digest: Optional[str] = None, jti: Optional[str] = None):
+        with self._lock:
+            if digest:
+                self._entries.pop(digest, None)
+            if jti:
+                for key in [key for key, (claims, _) in self._entries.items() if claims.get("jti") == jti]:
+                    del self._entries[key]
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+# --- Redis tier, shared by every worker of the service ---
+
+def shared_get(digest: str) -> Optional[dict]:
+    try:
+        cached = redis_client.get(SHARED_TOKEN_KEY.format(digest=digest))
+    except Exception as e:
+        print(f"[TokenCache] Redis read failed: {e}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def shared_put(digest: str, claims: dict):
+    ttl = int(token_cache.expires_at(claims) - time.time())
+    if ttl <= 0:
+        return
+    try:
+        redis_client.set(SHARED_TOKEN_KEY.format(digest=digest), json.dumps(claims), ex=ttl)
+    except Exception as e:
+        print(f"[TokenCache] Redis write failed: {e}")
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    if not jti:
+        return False
+    try:
+        return bool(redis_client.exists(REVOKED_KEY.format(jti=jti)))
+    except Exception as e:
+        # Fail open: a Redis outage must not log every user out
+        print(f"[TokenCache] Revocation check failed: {e}")
+        return False
+
+
+# ✅ Evict revoked tokens as soon as auth-service announces them
+def start_revocation_listener():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REVOCATION_CHANNEL)
+                print(f"✅ Listening for token revocations on: {REVOCATION_CHANNEL}")
+                for message in pubsub.listen():
+                    data = json.loads(message["data"])
+                    token_cache.evict(digest=data.get("digest"), jti=data.get("jti"))
+            except Exception as e:
+                print(f"🔥 Revocation listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
@@ -0,0 +1,28 @@
+# tracking.py
+#
+# Publishes delivery changes to order-service's live tracking channel
+# (order-service/tracking.py), which streams them to the customer over SSE.
+
+import json
+from datetime import datetime
+
+from redis_client import redis_client
+
+TRACK_CHANNEL = "order:track:{order_uid}"
+
+
+def publish(delivery):
+    status = delivery.status.value if hasattr(delivery.status, "value") else delivery.status
+    event = {
+        "order_uid": delivery.order_uid,
+        "source": "delivery",
+        "status": status,
+        "delivery_uid": delivery.delivery_uid,
+        "delivery_person_id": delivery.delivery_person_id,
+        "at": datetime.utcnow().isoformat(),
+    }
+    try:
+        redis_client.publish(TRACK_CHANNEL.format(order_uid=delivery.order_uid), json.dumps(event))
+    except Exception as e:
+        # Trackers miss this one; the delivery endpoints still have it
+        print(f"[Tracking] Redis publish failed: {e}")
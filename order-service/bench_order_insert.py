@@ -0,0 +1,60 @@
+# bench_order_insert.py
+#
+# Compares order rows/sec of the old create_order persistence (two commits plus
+# refreshes, one INSERT per item) with the current single transaction (INSERT ...
+# RETURNING for the order, one multi-row INSERT for its items, plus the outbox row).
+# Usage: DATABASE_URL=postgresql://... python bench_order_insert.py [orders] [items_per_order]
+# Point it at a scratch database - it creates the tables and leaves the rows behind.
+
+import sys
+import time
+from sqlalchemy import insert
+import models, database
+from outbox_relay import add_event
+
+
+def legacy_order(db, items):
+    order = models.Order(customer_id=1, outlet_code="BENCH", total_price=10.0, status=models.OrderStatus.PENDING)
+    db.add(order)
+    db.commit()
+    db.refresh(order)
+    for pizza_id, quantity, price in items:
+        db.add(models.OrderItem(order_id=order.id, pizza_id=pizza_id, quantity=quantity, price=price))
+    db.commit()
+    db.refresh(order)
+
+
+def single_transaction_order(db, items):
+    order = db.execute(
+        insert(models.Order).values(
+            customer_id=1, outlet_code="BENCH", total_price=10.0, status=models.OrderStatus.PENDING
+        ).returning(models.Order.id, models.Order.order_uid, models.Order.created_at)
+    ).one()
+    db.execute(insert(models.OrderItem), [
+        {"order_id": order.id, "pizza_id": pizza_id, "quantity": quantity, "price": price}
+        for pizza_id, quantity, price in items
+    ])
+    add_event(db, "bench_topic", order.order_uid, {"order_uid": order.order_uid})
+    db.commit()
+
+
+def run(label, create, orders, items):
+    db = database.SessionLocal()
+    try:
+        start = time.perf_counter()
+        for _ in range(orders):
+            create(db, items)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    print(f"{label:<20} {orders / elapsed:10.1f} orders/s  {orders * (len(items) + 1) / elapsed:10.1f} rows/s")
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    items_per_order = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    items = [(pizza_id, 2, 9.99) for pizza_id in range(1, items_per_order + 1)]
+
+    models.Base.metadata.create_all(bind=database.engine)
+    run("legacy", legacy_order, orders, items)
+    run("single transaction", single_transaction_order, orders, items)
@@ -1,9 +1,12 @@
 from pydantic import BaseSettings
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
     authjwt_secret_key: str = os.getenv('SECRET_KEY')
     authjwt_algorithm: str = os.getenv('JWT_ALGORITHM')
+    # Only needed with an asymmetric JWT_ALGORITHM such as RS256
+    authjwt_public_key: Optional[str] = os.getenv('JWT_PUBLIC_KEY')
 
     class Config:
         env_file = ".env"  # Optional: if you're using an .env file for environment variables
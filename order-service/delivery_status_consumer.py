@@ -0,0 +1,247 @@
+# delivery_status_consumer.py
+#
+# Keeps orders.status in step with deliveries. delivery-service publishes every delivery
+# status change on delivery_status_topic (delivery-service/status_events.py) with a
+# per-delivery version; batches are applied here in one transaction and offsets are
+# committed only after the DB commit. An event is applied only if its version is newer
+# than the order's delivery_version, so replays and out-of-order events change nothing.
+#
+# Run standalone with: python delivery_status_consumer.py
+
+import json
+import signal
+import threading
+import time
+from datetime import datetime
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+from sqlalchemy import bindparam, update
+import models, database
+import etag
+import tracking
+import order_status_cache
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+DELIVERY_STATUS_TOPIC = "delivery_status_topic"
+GROUP_ID = "order-service-group"
+
+CONSUMER_BATCH_SIZE = int(os.getenv("STATUS_CONSUMER_BATCH_SIZE", 500))
+CONSUMER_BATCH_TIMEOUT = float(os.getenv("STATUS_CONSUMER_BATCH_TIMEOUT", 1.0))
+CONSUMER_RETRY_BACKOFF = float(os.getenv("STATUS_CONSUMER_RETRY_BACKOFF", 2.0))
+
+# Delivery status -> order status; PENDING deliveries leave the order as it is
+ORDER_STATUS_FOR = {
+    "DISPATCHED": models.OrderStatus.OUT_FOR_DELIVERY,
+    "IN_TRANSIT": models.OrderStatus.OUT_FOR_DELIVERY,
+    "DELIVERED": models.OrderStatus.DELIVERED,
+}
+# Orders in these states are never moved by a delivery event
+FINAL_STATUSES = (models.OrderStatus.CANCELLED, models.OrderStatus.DELIVERED)
+
+_stop = threading.Event()
+_thread = None
+_counters = {"applied": 0, "stale": 0, "skipped": 0}
+_counters_lock = threading.Lock()
+
+
+def parse_event(msg):
+    """(order_uid, delivery status, version), or None for a message that can't be used."""
+    try:
+        data = json.loads(msg.value().decode("utf-8"))
+        return str(data["order_uid"]), str(data["status"]), int(data["version"])
+    except (AttributeError, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        print(f"⚠️ Skipping unreadable status event {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+        return None
+
+
+def latest_events(messages) -> dict:
+    """Newest event per order_uid in the batch; older ones would be overwritten anyway."""
+    latest = {}
+    for msg in messages:
+        event = parse_event(msg)
+        if event is None:
+            _count("skipped")
+            continue
+        order_uid, status, version = event
+        if order_uid not in latest or version > latest[order_uid][1]:
+            latest[order_uid] = (status, version)
+    return latest
+
+
+def apply_events(latest: dict) -> tuple:
+    """Write newer delivery statuses to their orders.
+
+    Returns (order_uid -> new order status, order_uid -> (order id, updated_at),
+    order_uid -> order_status_cache record) for the orders it changed.
+    """
+    if not latest:
+        return {}, {}, {}
+
+    db = database.SessionLocal()
+    try:
+        # Lock the orders first so the version check and the write can't interleave with another batch
+        current = {
+            order.order_uid: order
+            for order in db.query(models.Order)
+            .filter(models.Order.order_uid.in_(list(latest)))
+            .with_for_update()
+            .all()
+        }
+        now = datetime.utcnow()
+        rows, changed, versions, records = [], {}, {}, {}
+        for order_uid, (delivery_status, version) in latest.items():
+            order = current.get(order_uid)
+            if order is None or (order.delivery_version or 0) >= version:
+                _count("stale")
+                continue
+            rows.append({"uid": order_uid, "new_delivery_status": delivery_status, "version": version})
+            versions[order_uid] = (order.id, now)
+            new_status = ORDER_STATUS_FOR.get(delivery_status)
+            if new_status and order.status not in FINAL_STATUSES and order.status != new_status:
+                changed[order_uid] = new_status
+            # Built now, while the loaded row is still current; the commit expires it
+            records[order_uid] = order_status_cache.record(
+                order, status=changed.get(order_uid, order.status), delivery_status=delivery_status, updated_at=now
+            )
+
+        if rows:
+            # Core table update, so the rows run as one executemany
+            db.execute(
+                update(models.Order.__table__)
+                .where(models.Order.__table__.c.order_uid == bindparam("uid"))
+                .values(delivery_status=bindparam("new_delivery_status"), delivery_version=bindparam("version"),
+                        updated_at=now),
+                rows,
+            )
+        for status in set(changed.values()):
+            uids = [order_uid for order_uid, order_status in changed.items() if order_status == status]
+            db.query(models.Order).filter(models.Order.order_uid.in_(uids)).update(
+                {models.Order.status: status, models.Order.updated_at: now}, synchronize_session=False
+            )
+        db.commit()
+        _count("applied", len(rows))
+        return changed, versions, records
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _count(name: str, n: int = 1):
+    with _counters_lock:
+        _counters[name] += n
+
+
+def rewind(consumer, messages):
+    """Seek every partition in the batch back to its first message so the batch is redelivered."""
+    first_offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        first_offsets[key] = min(first_offsets.get(key, msg.offset()), msg.offset())
+    for (topic, partition), offset in first_offsets.items():
+        consumer.seek(TopicPartition(topic, partition, offset))
+
+
+def store_offsets(consumer, messages):
+    """Mark messages as done; commits only ever cover stored offsets."""
+    next_offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        next_offsets[key] = max(next_offsets.get(key, 0), msg.offset() + 1)
+    if next_offsets:
+        consumer.store_offsets(offsets=[
+            TopicPartition(topic, partition, offset) for (topic, partition), offset in next_offsets.items()
+        ])
+
+
+def process_batch(consumer, messages):
+    records = [msg for msg in messages if not msg.error()]
+    for msg in messages:
+        if msg.error():
+            print(f"❌ Kafka error: {msg.error()}")
+    if not records:
+        return
+
+    latest = latest_events(records)
+    try:
+        changed, versions, cached = apply_events(latest)
+    except Exception as e:
+        print(f"🔥 Status batch of {len(records)} events failed, replaying in {CONSUMER_RETRY_BACKOFF}s: {e}")
+        rewind(consumer, records)
+        time.sleep(CONSUMER_RETRY_BACKOFF)
+        return
+
+    store_offsets(consumer, records)
+    consumer.commit(asynchronous=True)
+    for order_uid, (order_id, updated_at) in versions.items():
+        etag.stamp("order", order_uid, order_id, updated_at)
+    order_status_cache.update(cached)
+    for order_uid, status in changed.items():
+        tracking.publish(order_uid, status.value)
+    print(f"✅ Status batch: {len(changed)} orders moved by {len(records)} events")
+
+
+def commit_offsets(consumer):
+    try:
+        consumer.commit(asynchronous=False)
+    except KafkaException as e:
+        # Nothing consumed since the last commit
+        print(f"ℹ️ Offset commit skipped: {e}")
+
+
+def consumer_stats() -> dict:
+    with _counters_lock:
+        return {"running": bool(_thread and _thread.is_alive()), **_counters}
+
+
+def run_consumer():
+    consumer = Consumer({
+        'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
+        'group.id': GROUP_ID,
+        'client.id': "order-status-consumer",
+        'auto.offset.reset': 'earliest',
+        'enable.auto.commit': False,
+        'enable.auto.offset.store': False
+    })
+
+    def on_revoke(consumer, partitions):
+        # Every consumed batch is already in the DB; make sure its offsets land first
+        commit_offsets(consumer)
+
+    consumer.subscribe([DELIVERY_STATUS_TOPIC], on_revoke=on_revoke)
+    print(f"✅ Kafka Consumer started, listening to topic: {DELIVERY_STATUS_TOPIC}")
+
+    try:
+        while not _stop.is_set():
+            messages = consumer.consume(num_messages=CONSUMER_BATCH_SIZE, timeout=CONSUMER_BATCH_TIMEOUT)
+            if messages:
+                process_batch(consumer, messages)
+    finally:
+        commit_offsets(consumer)
+        consumer.close()
+        print("🔒 Delivery status consumer closed gracefully.")
+
+
+def start_status_consumer():
+    global _thread
+    _stop.clear()
+    _thread = threading.Thread(target=run_consumer, daemon=True)
+    _thread.start()
+
+
+def stop_status_consumer():
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=CONSUMER_BATCH_TIMEOUT + 15)
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+    try:
+        run_consumer()
+    except KeyboardInterrupt:
+        print("🛑 Delivery status consumer interrupted manually.")
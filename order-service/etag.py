@@ -0,0 +1,131 @@
+# etag.py
+#
+# Version-based ETags for single-row reads. Each row's current ETag is also kept
+# in Redis as a version stamp, so a poll that already has the latest version gets
+# a 304 without touching the database. Stamps carry the row's version (updated_at in
+# ms) and are only ever replaced by the same or a newer one, so neither a read that
+# started before a write nor a slow writer can put an older version back. Deletes
+# leave a tombstone that nothing replaces.
+
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+from redis_client import redis_client
+
+ETAG_STAMP_TTL = int(os.getenv("ETAG_STAMP_TTL", 86400))
+
+STAMP_KEY = "etag:{kind}:{key}"
+# Stamp of a deleted row; never matches a client's ETag and is never replaced
+GONE = "gone"
+
+# Sets "<version>|<etag>" unless the stored stamp is newer or a tombstone
+_STAMP_IF_NEWER = redis_client.register_script("""
+local current = redis.call('GET', KEYS[1])
+if current then
+    local version = tonumber(string.match(current, '^(%d+)|'))
+    if version == nil or version > tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. ARGV[2], 'EX', ARGV[3])
+return 1
+""")
+
+
+def _version(updated_at: datetime) -> int:
+    return int(updated_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def version_etag(row_id: int, updated_at: datetime) -> str:
+    return f'"{row_id}-{_version(updated_at)}"'
+
+
+def http_date(updated_at: datetime) -> str:
+    return format_datetime(updated_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def stamp_matches(request: Request, kind: str, key: str) -> Optional[str]:
+    """The stored ETag if the client's If-None-Match already names it, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    try:
+        stamp = redis_client.get(STAMP_KEY.format(kind=kind, key=key))
+    except Exception as e:
+        print(f"[ETag] Redis read failed: {e}")
+        return None
+    etag = stamp.partition("|")[2] if stamp else ""
+    return etag if etag and etag in if_none_match else None
+
+
+def _stamp_if_newer(kind: str, key: str, row_id: int, updated_at: datetime):
+    _STAMP_IF_NEWER(
+        keys=[STAMP_KEY.format(kind=kind, key=key)],
+        args=[_version(updated_at), version_etag(row_id, updated_at), ETAG_STAMP_TTL],
+    )
+
+
+def remember(kind: str, key: str, row_id: int, updated_at: datetime):
+    """Read path: store the stamp of the version just read, unless a newer one is there."""
+    try:
+        _stamp_if_newer(kind, key, row_id, updated_at)
+    except Exception as e:
+        print(f"[ETag] Redis write failed: {e}")
+
+
+def stamp(kind: str, key: str, row_id: int, updated_at: datetime):
+    """Write path: store the committed version, unless a newer one is there."""
+    try:
+        _stamp_if_newer(kind, key, row_id, updated_at)
+    except Exception as e:
+        print(f"[ETag] Redis write failed: {e}")
+        try:
+            redis_client.delete(STAMP_KEY.format(kind=kind, key=key))
+        except Exception:
+            # The stamp then outlives the change by at most ETAG_STAMP_TTL
+            pass
+
+
+def forget(kind: str, key: str):
+    """Write path for deletes."""
+    try:
+        redis_client.set(STAMP_KEY.format(kind=kind, key=key), GONE, ex=ETAG_STAMP_TTL)
+    except Exception as e:
+        print(f"[ETag] Redis write failed: {e}")
+        try:
+            redis_client.delete(STAMP_KEY.format(kind=kind, key=key))
+        except Exception:
+            # The stamp then outlives the delete by at most ETAG_STAMP_TTL
+            pass
+
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag in if_none_match or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def not_modified(etag: str, updated_at: Optional[datetime] = None) -> Response:
+    headers = {"ETag": etag}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at)
+    return Response(status_code=304, headers=headers)
+
+
+def set_headers(response: Response, etag: str, updated_at: datetime):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(updated_at)
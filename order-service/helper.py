@@ -1,8 +1,31 @@
 # utils/timezone.py
 from datetime import datetime
+import base64
 import pytz
 
 def to_ist(utc_dt: datetime) -> str:
     """Convert UTC datetime to IST formatted string"""
     ist = pytz.timezone("Asia/Kolkata")
     return utc_dt.astimezone(ist).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """Opaque keyset cursor pointing just past the given order"""
+    raw = f"{created_at.isoformat()}|{order_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Return (created_at, id) from a cursor, or raise ValueError"""
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def to_utc_naive(dt: datetime) -> datetime:
+    """created_at is stored as naive UTC, so compare filters in the same form"""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(pytz.utc).replace(tzinfo=None)
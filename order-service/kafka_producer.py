@@ -1,33 +1,40 @@
 from confluent_kafka import Producer
-import json
 import os
 
-# Kafka configuration
+NEW_ORDER_TOPIC = "new_order_topic"
+
+# Kafka configuration. Only the outbox relay produces, so batching (linger) and
+# compression cost no request latency.
 kafka_config = {
-    'bootstrap.servers': os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+    'bootstrap.servers': os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092"),
+    'enable.idempotence': True,
+    'linger.ms': int(os.getenv("KAFKA_LINGER_MS", 20)),
+    'batch.num.messages': int(os.getenv("KAFKA_BATCH_NUM_MESSAGES", 500)),
+    'compression.type': os.getenv("KAFKA_COMPRESSION_TYPE", "lz4"),
 }
 
 # Create Kafka producer instance
 producer = Producer(kafka_config)
 
-# Optional: Delivery report callback
-def delivery_report(err, msg):
-    if err is not None:
-        print(f"❌ Delivery failed for Order UID {msg.key().decode()}: {err}")
-    else:
-        print(f"📬 Message delivered to {msg.topic()} [{msg.partition()}]")
 
-# Produce delivery event
-def delivery_event_producer(order_data: dict):
-    try:
+# Produce a batch of outbox rows, return the ids the broker acknowledged
+def publish_events(events, timeout: float = 10.0) -> list:
+    delivered = []
+
+    def delivery_report(err, msg, event_id):
+        if err is not None:
+            print(f"❌ Delivery failed for key {msg.key().decode()}: {err}")
+        else:
+            delivered.append(event_id)
+
+    for event in events:
         producer.produce(
-            topic="new_order_topic",
-            key=str(order_data["order_uid"]),
-            value=json.dumps(order_data),
-            callback=delivery_report
+            topic=event.topic,
+            key=event.event_key,
+            value=event.payload,
+            callback=lambda err, msg, event_id=event.id: delivery_report(err, msg, event_id)
         )
-        producer.poll(0)  # Trigger delivery report callbacks
-        producer.flush()
-        print(f"✅ Kafka: Order event published: {order_data['order_uid']}")
-    except Exception as e:
-        print(f"❌ Kafka error: {e}")
+        producer.poll(0)  # Serve delivery callbacks while producing
+
+    producer.flush(timeout)
+    return delivered
@@ -1,13 +1,57 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+import os
 from fastapi_jwt_auth import AuthJWT
 import order_routes
 from config import Settings
 from middleware import AuthMiddleware
-app = FastAPI()
+import http_client
+from token_cache import start_revocation_listener
+from outlet_directory import start_outlet_directory
+from tracking import start_tracking_listener
+from outbox_relay import start_outbox_relay, stop_outbox_relay
+import delivery_status_consumer
+
+# Set to "false" when the relay runs as its own process (python outbox_relay.py)
+OUTBOX_RELAY_IN_PROCESS = os.getenv("OUTBOX_RELAY_IN_PROCESS", "true").lower() == "true"
+# Likewise for python delivery_status_consumer.py
+STATUS_CONSUMER_IN_PROCESS = os.getenv("STATUS_CONSUMER_IN_PROCESS", "true").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_revocation_listener()
+    start_outlet_directory()
+    start_tracking_listener()
+    await http_client.startup()
+    if OUTBOX_RELAY_IN_PROCESS:
+        start_outbox_relay()
+    if STATUS_CONSUMER_IN_PROCESS:
+        delivery_status_consumer.start_status_consumer()
+    yield
+    if STATUS_CONSUMER_IN_PROCESS:
+        delivery_status_consumer.stop_status_consumer()
+    if OUTBOX_RELAY_IN_PROCESS:
+        stop_outbox_relay()
+    await http_client.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @AuthJWT.load_config
 def get_config():
     return Settings()
 
 app.add_middleware(AuthMiddleware)
-app.include_router(order_routes.order_router)
\ No newline at end of file
+app.include_router(order_routes.order_router)
+
+
+# ✅ Circuit breaker state and counters per upstream dependency
+@app.get("/health/upstreams", tags=["health"])
+async def upstream_health():
+    return http_client.upstream_stats()
+
+
+# ✅ Delivery status events applied to orders, and those ignored as stale or unreadable
+@app.get("/health/status-consumer", tags=["health"])
+async def status_consumer_health():
+    return delivery_status_consumer.consumer_stats()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum as SqlEnum, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum as SqlEnum, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum
@@ -24,17 +24,28 @@ class Order(Base):
     total_price = Column(Float, nullable=False)
     status = Column(SqlEnum(OrderStatus), default=OrderStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Drives the ETag of GET /by_uid/{order_uid}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     order_uid = Column(String, unique=True, index=True, default=lambda: str(uuid.uuid4()))
     delivery_address = Column(Text, nullable=True)
+    # Last delivery-service status applied by delivery_status_consumer.py, and its version
+    delivery_status = Column(String, nullable=True)
+    delivery_version = Column(Integer, nullable=True)
 
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) newest first, for admins and per customer
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_customer_created_at_id", "customer_id", "created_at", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
 
     # Pizza ID from menu-service
     pizza_id = Column(Integer, nullable=False)
@@ -42,3 +53,20 @@ class OrderItem(Base):
     price = Column(Float, nullable=False)
 
     order = relationship("Order", back_populates="items")
+
+
+# Events written in the same transaction as the order, drained to Kafka by outbox_relay.py
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, nullable=False)
+    event_key = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Keeps the relay's "oldest unsent first" scan cheap however large the table gets
+        Index("ix_outbox_unsent", "id", postgresql_where=sent_at.is_(None)),
+    )
@@ -1,111 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
-from fastapi_jwt_auth import AuthJWT
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
-import requests
+from datetime import datetime
+import asyncio
+import csv
+import io
+import json
 import os
-from helper import to_ist
+from helper import to_ist, encode_cursor, decode_cursor, to_utc_naive
 import models, schemas, database
 from pytz import timezone
 from uuid import UUID
-from kafka_producer import delivery_event_producer
+from kafka_producer import NEW_ORDER_TOPIC
+import outbox_relay
+import etag
+import tracking
+import order_status_cache
+import service_clients
+from middleware import get_current_user
 
 
 order_router = APIRouter(prefix="/api/v1/order", tags=["order"])
 
+DEFAULT_PAGE_SIZE = int(os.getenv("ORDER_PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = int(os.getenv("ORDER_MAX_PAGE_SIZE", "100"))
+EXPORT_BATCH_SIZE = int(os.getenv("ORDER_EXPORT_BATCH_SIZE", "1000"))
+
 # ✅ Create a new order
 @order_router.post("/create", response_model=schemas.OrderOut, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order: schemas.OrderCreate,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: dict = Depends(get_current_user),
     Authorization: Optional[str] = Header(None)
 ):
-    try:
-        Authorize.jwt_required()
-        raw_jwt = Authorize.get_raw_jwt()
-        user_id = raw_jwt.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_id = user.get("user_id")
 
     headers = {"Authorization": f"{Authorization}"}
 
-    # ✅ Validate outlet_code with outlet service
-    outlet_service_url = os.getenv("OUTLET_SERVICE_BASE_URL", "http://127.0.0.1:8003") + f"/api/v1/outlet/{order.outlet_code}"
-
+    # ✅ Validate outlet_code and fetch pizza details concurrently
+    _, pizzas = await asyncio.gather(
+        service_clients.check_outlet(order.outlet_code, headers),
+        service_clients.fetch_pizzas([item.pizza_id for item in order.items], headers)
+    )
 
-    try:
-        outlet_response = requests.get(outlet_service_url, headers=headers, timeout=5)
-        if outlet_response.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"Outlet with code '{order.outlet_code}' not found")
-    except requests.RequestException:
-        raise HTTPException(status_code=503, detail="Failed to communicate with outlet service")
-
-    # ✅ Fetch pizza details and calculate total price
-    pizza_service_url_base = os.getenv("PIZZA_SERVICE_BASE_URL", "http://127.0.0.1:8002")
+    # ✅ Calculate total price
     total_price = 0.0
     validated_items = []
 
     for item in order.items:
-        pizza_url = f"{pizza_service_url_base}/api/v1/pizza/{item.pizza_id}"
-        try:
-            response = requests.get(pizza_url, headers=headers, timeout=5)
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail=f"Pizza with ID {item.pizza_id} not found")
-
-            pizza_data = response.json()
-            price = pizza_data["price"]
-            quantity = item.quantity
-            subtotal = price * quantity
-            total_price += subtotal
-
-            validated_items.append({
-                "pizza_id": item.pizza_id,
-                "quantity": quantity,
-                "unit_price": price,
-                "subtotal": subtotal
-            })
-
-        except requests.RequestException:
-            raise HTTPException(status_code=503, detail="Failed to contact pizza service")
-
-    # ✅ Create and store the order
-    new_order = models.Order(
-        customer_id=user_id,
-        outlet_code=order.outlet_code,
-        total_price=total_price,
-        status=schemas.OrderStatus.PENDING,
-        delivery_address = order.delivery_address
-    )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-
-    # ✅ Send Kafka event to delivery-service
-    try:
-        delivery_event_producer({
-            "order_uid": str(new_order.order_uid),
-            "customer_id": new_order.customer_id,
-            "outlet_code": new_order.outlet_code,
-            "total_price": new_order.total_price,
-            "status": str(new_order.status),
-            "delivery_address": new_order.delivery_address,
-            "items": validated_items,
-            "created_at": new_order.created_at.isoformat()
+        price = pizzas[item.pizza_id]["price"]
+        quantity = item.quantity
+        subtotal = price * quantity
+        total_price += subtotal
+
+        validated_items.append({
+            "pizza_id": item.pizza_id,
+            "quantity": quantity,
+            "unit_price": price,
+            "subtotal": subtotal
         })
-    except Exception as e:
-        print(f"[Kafka Error] Failed to send event for order {new_order.order_uid} - {e}")
 
-    # ✅ Store order items
-    for item in validated_items:
-        db.add(models.OrderItem(
-            order_id=new_order.id,
-            pizza_id=item["pizza_id"],
-            quantity=item["quantity"],
-            price=item["unit_price"]
-        ))
+    # ✅ Create the order, its items and the delivery event in one transaction
+    new_order = db.execute(
+        insert(models.Order).values(
+            customer_id=user_id,
+            outlet_code=order.outlet_code,
+            total_price=total_price,
+            status=schemas.OrderStatus.PENDING,
+            delivery_address=order.delivery_address
+        ).returning(models.Order.id, models.Order.order_uid, models.Order.created_at, models.Order.status,
+                    models.Order.total_price, models.Order.customer_id, models.Order.updated_at)
+    ).one()
+
+    # ✅ Store order items with a single multi-row insert
+    if validated_items:
+        db.execute(insert(models.OrderItem), [
+            {
+                "order_id": new_order.id,
+                "pizza_id": item["pizza_id"],
+                "quantity": item["quantity"],
+                "price": item["unit_price"]
+            } for item in validated_items
+        ])
+
+    # ✅ Queue the delivery-service event (published by outbox_relay)
+    outbox_relay.add_event(db, NEW_ORDER_TOPIC, str(new_order.order_uid), {
+        "order_uid": str(new_order.order_uid),
+        "customer_id": user_id,
+        "outlet_code": order.outlet_code,
+        "total_price": total_price,
+        "status": str(new_order.status),
+        "delivery_address": order.delivery_address,
+        "items": validated_items,
+        "created_at": new_order.created_at.isoformat()
+    })
     db.commit()
-    db.refresh(new_order)
+    outbox_relay.wake()
+    order_status_cache.put(new_order)
 
     # ✅ Prepare response with full calculation
     response_items = [
@@ -119,94 +114,211 @@ async def create_order(
 
     return schemas.OrderOut(
         id=new_order.id,
-        customer_id=new_order.customer_id,
-        outlet_code=new_order.outlet_code,
-        total_price=new_order.total_price,
+        customer_id=user_id,
+        outlet_code=order.outlet_code,
+        total_price=total_price,
         status=new_order.status,
         created_at=new_order.created_at.astimezone(timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
         order_uid=new_order.order_uid,
         items=response_items,
-        delivery_address=new_order.delivery_address
+        delivery_address=order.delivery_address
     )
 
 
 
-# ✅ Get all orders
+def _order_out(order: models.Order) -> schemas.OrderOut:
+    return schemas.OrderOut(
+        id=order.id,
+        customer_id=order.customer_id,
+        outlet_code=order.outlet_code,
+        total_price=order.total_price,
+        status=order.status,
+        created_at=to_ist(order.created_at),
+        order_uid=order.order_uid,
+        items=[
+            schemas.OrderItemOut(
+                pizza_id=item.pizza_id,
+                quantity=item.quantity,
+                unit_price=item.price,
+                subtotal=item.price * item.quantity
+            ) for item in order.items
+        ],
+        delivery_address=order.delivery_address
+    )
+
+
+def _filter_orders(
+    query,
+    order_status: Optional[schemas.OrderStatus],
+    outlet_code: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime]
+):
+    if order_status:
+        query = query.filter(models.Order.status == order_status)
+    if outlet_code:
+        query = query.filter(models.Order.outlet_code == outlet_code)
+    if created_from:
+        query = query.filter(models.Order.created_at >= to_utc_naive(created_from))
+    if created_to:
+        query = query.filter(models.Order.created_at < to_utc_naive(created_to))
+    return query
+
+
+def _order_page(query, response: Response, cursor: Optional[str], limit: int) -> List[schemas.OrderOut]:
+    """One page of orders, newest first, keyed on (created_at, id).
+
+    The next page's cursor is returned in the X-Next-Cursor header and is absent on the last page.
+    """
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(models.Order.created_at, models.Order.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    orders = (
+        query.options(selectinload(models.Order.items))
+        .order_by(models.Order.created_at.desc(), models.Order.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(orders[-1].created_at, orders[-1].id)
+
+    return [_order_out(order) for order in orders]
+
+
+# ✅ Get all orders (paginated)
 @order_router.get("/", response_model=List[schemas.OrderOut])
 async def get_all_orders(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order_status: Optional[schemas.OrderStatus] = Query(None, alias="status"),
+    outlet_code: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user = Authorize.get_raw_jwt()
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
-
     user_role = user.get("role")
-    print(user_role)
     if user_role != "ADMIN":
         raise HTTPException(status_code=403, detail="Only admins can access all orders")
 
-    orders = db.query(models.Order).all()
-
-    return [
-        schemas.OrderOut(
-            id=order.id,
-            customer_id=order.customer_id,
-            outlet_code=order.outlet_code,
-            total_price=order.total_price,
-            status=order.status,
-            created_at=to_ist(order.created_at),
-            order_uid=order.order_uid,
-            items=[
-                schemas.OrderItemOut(
-                    pizza_id=item.pizza_id,
-                    quantity=item.quantity,
-                    unit_price=item.price,
-                    subtotal=item.price * item.quantity
-                ) for item in order.items
-            ]
-        ) for order in orders
-    ]
+    query = _filter_orders(db.query(models.Order), order_status, outlet_code, created_from, created_to)
+    return _order_page(query, response, cursor, limit)
 
+# ✅ Get my orders (paginated)
 @order_router.get("/history", response_model=List[schemas.OrderOut])
 async def get_my_orders(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order_status: Optional[schemas.OrderStatus] = Query(None, alias="status"),
+    outlet_code: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_claims = Authorize.get_raw_jwt()
-        user_id = user_claims.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    user_id = user.get("user_id")
 
-    orders = db.query(models.Order).filter(models.Order.customer_id == user_id).order_by(models.Order.created_at.desc()).all()
-    response = []
+    query = db.query(models.Order).filter(models.Order.customer_id == user_id)
+    query = _filter_orders(query, order_status, outlet_code, created_from, created_to)
+    return _order_page(query, response, cursor, limit)
 
-    for order in orders:
-        items = [
-            schemas.OrderItemOut(
-                pizza_id=item.pizza_id,
-                quantity=item.quantity,
-                unit_price=item.price,
-                subtotal=item.price * item.quantity
-            ) for item in order.items
-        ]
 
-        response.append(schemas.OrderOut(
-            id=order.id,
-            customer_id=order.customer_id,
-            outlet_code=order.outlet_code,
-            total_price=order.total_price,
-            status=order.status,
-            created_at=order.created_at.astimezone(timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
-            order_uid=order.order_uid,
-            items=items
-        ))
+EXPORT_COLUMNS = [
+    "id", "order_uid", "customer_id", "outlet_code", "total_price",
+    "status", "created_at", "delivery_address", "items"
+]
+
+
+def _export_rows(
+    export_format: schemas.ExportFormat,
+    order_status: Optional[schemas.OrderStatus],
+    outlet_code: Optional[str],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime]
+):
+    """Yield the export in chunks of EXPORT_BATCH_SIZE orders from a server-side cursor."""
+    db = database.SessionLocal()
+    try:
+        query = _filter_orders(db.query(models.Order), order_status, outlet_code, created_from, created_to)
+        query = (
+            query.options(selectinload(models.Order.items))
+            .order_by(models.Order.created_at, models.Order.id)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == schemas.ExportFormat.CSV:
+            writer.writerow(EXPORT_COLUMNS)
+
+        for count, order in enumerate(query, start=1):
+            if export_format == schemas.ExportFormat.CSV:
+                writer.writerow([
+                    order.id, order.order_uid, order.customer_id, order.outlet_code, order.total_price,
+                    order.status.value, order.created_at.isoformat(), order.delivery_address or "",
+                    ";".join(f"{item.pizza_id}x{item.quantity}@{item.price}" for item in order.items)
+                ])
+            else:
+                buffer.write(json.dumps({
+                    "id": order.id,
+                    "order_uid": order.order_uid,
+                    "customer_id": order.customer_id,
+                    "outlet_code": order.outlet_code,
+                    "total_price": order.total_price,
+                    "status": order.status.value,
+                    "created_at": order.created_at.isoformat(),
+                    "delivery_address": order.delivery_address,
+                    "items": [
+                        {"pizza_id": item.pizza_id, "quantity": item.quantity, "unit_price": item.price}
+                        for item in order.items
+                    ]
+                }) + "\n")
+
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+# ✅ Export orders as NDJSON or CSV (admin reporting)
+@order_router.get("/export")
+async def export_orders(
+    export_format: schemas.ExportFormat = Query(schemas.ExportFormat.NDJSON, alias="format"),
+    order_status: Optional[schemas.OrderStatus] = Query(None, alias="status"),
+    outlet_code: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    user: dict = Depends(get_current_user)
+):
+    user_role = user.get("role")
+    if user_role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Only admins can export orders")
+
+    if export_format == schemas.ExportFormat.CSV:
+        media_type, filename = "text/csv", "orders.csv"
+    else:
+        media_type, filename = "application/x-ndjson", "orders.ndjson"
 
-    return response
+    return StreamingResponse(
+        _export_rows(export_format, order_status, outlet_code, created_from, created_to),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 # ✅ Get order by ID
@@ -214,13 +326,9 @@ async def get_my_orders(
 async def get_order_by_id(
     order_id: int,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
 
     if user_role not in ["ADMIN", "STAFF"]:
         raise HTTPException(status_code=403, detail="Access forbidden: only admin or staff allowed")
@@ -252,40 +360,33 @@ async def get_order_by_id(
 @order_router.get("/by_uid/{order_uid}", response_model=schemas.OrderOut)
 async def get_order_by_uid(
     order_uid: str,
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
 
     if user_role not in ["ADMIN", "STAFF", "CUSTOMER"]:
         raise HTTPException(status_code=403, detail="Access forbidden: only admin or staff allowed")
 
+    # ✅ Pollers that already have the latest version never reach the DB
+    current = etag.stamp_matches(request, "order", order_uid)
+    if current:
+        return etag.not_modified(current)
+
     order = db.query(models.Order).filter(models.Order.order_uid == order_uid).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    return schemas.OrderOut(
-        id=order.id,
-        customer_id=order.customer_id,
-        outlet_code=order.outlet_code,
-        total_price=order.total_price,
-        status=order.status,
-        created_at=to_ist(order.created_at),
-        order_uid=order.order_uid,
-        items=[
-            schemas.OrderItemOut(
-                pizza_id=item.pizza_id,
-                quantity=item.quantity,
-                price=item.price,
-                unit_price=item.price,
-                subtotal = item.price * item.quantity
-            ) for item in order.items
-        ]
-    )
+    updated_at = order.updated_at or order.created_at
+    order_etag = etag.version_etag(order.id, updated_at)
+    etag.remember("order", order_uid, order.id, updated_at)
+    if etag.is_not_modified(request, order_etag, updated_at):
+        return etag.not_modified(order_etag, updated_at)
+
+    etag.set_headers(response, order_etag, updated_at)
+    return _order_out(order)
 
 # ✅ update order status by UID
 @order_router.put("/{order_uid}/status", response_model=schemas.OrderOut)
@@ -293,24 +394,24 @@ async def update_order_status(
     order_uid: UUID,
     payload: schemas.UpdateOrderStatus,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
 
     if user_role not in ["STAFF", "DELIVERY"]:
         raise HTTPException(status_code=403, detail="Access forbidden: only staff or delivery person allowed")
 
-    order = db.query(models.Order).filter(models.Order.order_uid == str(order_uid)).first()
+    # Locked until commit, so the delivery status consumer can't interleave with this change
+    order = db.query(models.Order).filter(models.Order.order_uid == str(order_uid)).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
     order.status = payload.new_status
     db.commit()
     db.refresh(order)
+    etag.stamp("order", order.order_uid, order.id, order.updated_at)
+    order_status_cache.put(order)
+    tracking.publish(order.order_uid, order.status.value)
 
     return schemas.OrderOut(
         id=order.id,
@@ -336,57 +437,98 @@ async def update_order_status(
 async def get_order_status(
     order_uid: str,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends(),
+    user: dict = Depends(get_current_user),
 ):
-    try:
-        Authorize.jwt_required()
-        user_role = Authorize.get_raw_jwt().get("role")
-
-        user_claims = Authorize.get_raw_jwt()
-        user_id = user_claims.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
+    user_id = user.get("user_id")
 
     if user_role not in ["ADMIN", "STAFF", "CUSTOMER"]:
         raise HTTPException(status_code=403, detail="Access forbidden: customers, staff, admin only")
 
-    order = db.query(models.Order).filter(models.Order.order_uid == order_uid).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    # ✅ Served from the Redis status record; the DB is only read to fill a miss
+    cached = order_status_cache.get(order_uid)
+    if cached is None:
+        order = db.query(models.Order).filter(models.Order.order_uid == order_uid).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        order_status_cache.fill(order)
+        cached = {
+            "total_price": order.total_price,
+            "status": order.status.value,
+            "delivery_status": order.delivery_status,
+            "created_at": order.created_at.astimezone(timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
+            "order_uid": order.order_uid,
+            "customer_id": order.customer_id,
+        }
 
     # Optional: Ensure customer is viewing only their own order
     if user_role == "CUSTOMER":
-        if order.customer_id != int(user_id):
+        if cached["customer_id"] != int(user_id):
             raise HTTPException(status_code=403, detail="Access denied: not your order")
 
     return {
         # "outlet_code": order.outlet_code,
-        "total_price":order.total_price,
-        "status" : order.status,
-        "created_at": order.created_at.astimezone(timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
-        "order_uid": order.order_uid,
+        "total_price": cached["total_price"],
+        "status": cached["status"],
+        "delivery_status": cached["delivery_status"],
+        "created_at": cached["created_at"],
+        "order_uid": cached["order_uid"],
         # "items" :order.items
     }
 
+# ✅ Live order status over Server-Sent Events, instead of polling /status
+@order_router.get("/{order_uid}/track")
+async def track_order(
+    order_uid: str,
+    db: Session = Depends(database.get_db),
+    user: dict = Depends(get_current_user),
+):
+    user_role = user.get("role")
+    user_id = user.get("user_id")
+
+    if user_role not in ["ADMIN", "STAFF", "CUSTOMER"]:
+        raise HTTPException(status_code=403, detail="Access forbidden: customers, staff, admin only")
+
+    # Watch before reading, so a change committed in between still reaches the stream
+    queue = tracking.watchers.add(order_uid)
+    try:
+        order = db.query(models.Order).filter(models.Order.order_uid == order_uid).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        if user_role == "CUSTOMER" and order.customer_id != int(user_id):
+            raise HTTPException(status_code=403, detail="Access denied: not your order")
+    except Exception:
+        tracking.watchers.remove(order_uid, queue)
+        raise
+
+    current = {"order_uid": order.order_uid, "source": "order", "status": order.status.value}
+    # The session isn't needed while the stream stays open
+    db.close()
+
+    return StreamingResponse(
+        tracking.stream(order_uid, queue, current),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also unregisters a client that leaves before the stream has started
+        background=BackgroundTask(tracking.watchers.remove, order_uid, queue),
+    )
+
 # ✅ Cancel order by UID
 @order_router.patch("/{order_uid}/cancel", response_model=schemas.OrderOut)
 async def cancel_order(
     order_uid: UUID,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        claims = Authorize.get_raw_jwt()
-        user_role = claims.get("role")
-        user_id = claims.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
+    user_id = user.get("user_id")
 
     if user_role not in ["STAFF", "CUSTOMER"]:
         raise HTTPException(status_code=403, detail="Access forbidden: Respective Customer and Staff only")
 
-    order = db.query(models.Order).filter(models.Order.order_uid == str(order_uid)).first()
+    # Locked until commit, so the delivery status consumer can't interleave with this change
+    order = db.query(models.Order).filter(models.Order.order_uid == str(order_uid)).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -402,6 +544,9 @@ async def cancel_order(
     order.status = schemas.OrderStatus.CANCELLED
     db.commit()
     db.refresh(order)
+    etag.stamp("order", order.order_uid, order.id, order.updated_at)
+    order_status_cache.put(order)
+    tracking.publish(order.order_uid, order.status.value)
 
     return schemas.OrderOut(
         outlet_code=order.outlet_code,
@@ -424,15 +569,11 @@ async def cancel_order(
 async def delete_order(
     order_id: int,
     db: Session = Depends(database.get_db),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        user_role = Authorize.get_raw_jwt().get("role")
-        if user_role not in ["ADMIN"]:
-            raise HTTPException(status_code=403, detail="Access forbidden: only admin, staff, or customer allowed")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
+    user_role = user.get("role")
+    if user_role not in ["ADMIN"]:
+        raise HTTPException(status_code=403, detail="Access forbidden: only admin, staff, or customer allowed")
 
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
@@ -440,5 +581,7 @@ async def delete_order(
 
     db.delete(order)
     db.commit()
+    etag.forget("order", order.order_uid)
+    order_status_cache.forget(order.order_uid)
 
     return {"message": f"Order with ID {order_id} has been deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,136 @@
+# order_status_cache.py
+#
+# Compact per-order status record in Redis, one hash per order_uid, so status polls
+# (including the customer ownership check) never reach Postgres. Every write, whether
+# after a change or to fill a miss, stores the whole record with its version (the
+# order's updated_at in ms) and only lands if the cached one isn't newer, so neither
+# a fill that raced with a write nor writers finishing out of order can put older
+# values back. A deleted order leaves a short-lived tombstone that nothing replaces.
+
+import os
+from datetime import timezone as tz
+from typing import Optional
+
+from pytz import timezone
+
+import models
+from redis_client import redis_client
+
+ORDER_STATUS_TTL = int(os.getenv("ORDER_STATUS_TTL", 7 * 86400))
+# Outlives any read of the order that was in flight when it was deleted
+ORDER_STATUS_TOMBSTONE_TTL = int(os.getenv("ORDER_STATUS_TOMBSTONE_TTL", 300))
+
+STATUS_KEY = "order:status:{order_uid}"
+FIELDS = ("status", "total_price", "created_at", "customer_id", "delivery_status")
+TOMBSTONE = "deleted"
+
+# HSETs the record (ARGV[3:]) at version ARGV[1] unless the cached one is newer or a tombstone
+_WRITE_IF_NEWER = redis_client.register_script("""
+if redis.call('HEXISTS', KEYS[1], 'deleted') == 1 then
+    return 0
+end
+local version = tonumber(redis.call('HGET', KEYS[1], 'version'))
+if version and version > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', ARGV[1])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+""")
+
+
+def record(order, **changes) -> dict:
+    """The cached fields of an order (or an order row), with `changes` applied over its values."""
+    values = {field: getattr(order, field, None) for field in (*FIELDS, "updated_at")}
+    values.update(changes)
+    status = values["status"].value if hasattr(values["status"], "value") else values["status"]
+    updated_at = values["updated_at"] or values["created_at"]
+    return {
+        "version": int(updated_at.replace(tzinfo=tz.utc).timestamp() * 1000),
+        "status": status,
+        "total_price": repr(float(values["total_price"])),
+        "created_at": values["created_at"].astimezone(timezone("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M:%S"),
+        "customer_id": str(values["customer_id"]),
+        "delivery_status": values["delivery_status"] or "",
+    }
+
+
+def _write(records: dict):
+    pipe = redis_client.pipeline(transaction=False)
+    for order_uid, fields in records.items():
+        fields = dict(fields)
+        version = fields.pop("version")
+        pairs = [item for field_value in fields.items() for item in field_value]
+        _WRITE_IF_NEWER(keys=[STATUS_KEY.format(order_uid=order_uid)],
+                        args=[version, ORDER_STATUS_TTL, *pairs], client=pipe)
+    pipe.execute()
+
+
+def get(order_uid: str) -> Optional[dict]:
+    """The cached status of an order, or None when Redis doesn't have it."""
+    try:
+        record = redis_client.hgetall(STATUS_KEY.format(order_uid=order_uid))
+    except Exception as e:
+        print(f"[OrderStatusCache] Redis read failed: {e}")
+        return None
+    # A record with missing fields (a partial one from before versioned writes) counts as a miss
+    if TOMBSTONE in record or any(field not in record for field in FIELDS):
+        return None
+    return {
+        "total_price": float(record["total_price"]),
+        "status": record["status"],
+        "delivery_status": record["delivery_status"] or None,
+        "created_at": record["created_at"],
+        "order_uid": order_uid,
+        "customer_id": int(record["customer_id"]),
+    }
+
+
+def put(order: models.Order):
+    """Write-through after a change to the order has been committed."""
+    update({order.order_uid: record(order)})
+
+
+def update(records: dict):
+    """Write-through of committed changes: order_uid -> record() of the order as committed."""
+    if not records:
+        return
+    try:
+        _write(records)
+    except Exception as e:
+        # Dropped so the next poll reads the DB instead of an outdated record
+        print(f"[OrderStatusCache] Redis write failed: {e}")
+        _drop(*records)
+
+
+def fill(order: models.Order):
+    """Store what a read just loaded, unless a write has already stored a newer version."""
+    try:
+        _write({order.order_uid: record(order)})
+    except Exception as e:
+        print(f"[OrderStatusCache] Redis write failed: {e}")
+
+
+def forget(order_uid: str):
+    """After the order was deleted: replace its record with a tombstone."""
+    key = STATUS_KEY.format(order_uid=order_uid)
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, TOMBSTONE, "1")
+        pipe.expire(key, ORDER_STATUS_TOMBSTONE_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"[OrderStatusCache] Redis write failed: {e}")
+        _drop(order_uid)
+
+
+def _drop(*order_uids: str):
+    try:
+        redis_client.delete(*(STATUS_KEY.format(order_uid=order_uid) for order_uid in order_uids))
+    except Exception as e:
+        # The record then outlives the change by at most ORDER_STATUS_TTL
+        print(f"[OrderStatusCache] Redis delete failed: {e}")
@@ -0,0 +1,115 @@
+# outbox_relay.py
+#
+# Drains the outbox table to Kafka. Orders and their events are committed together,
+# so an event is never lost or published for an order that was rolled back. Rows are
+# claimed with FOR UPDATE SKIP LOCKED, so several workers can relay side by side.
+# Run standalone with: python outbox_relay.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+import models, database
+from kafka_producer import publish_events
+load_dotenv()
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", 24))
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+
+def add_event(db, topic: str, key: str, payload: dict):
+    """Stage an event in the caller's transaction; it is published after commit."""
+    db.add(models.OutboxEvent(topic=topic, event_key=key, payload=json.dumps(payload)))
+
+
+def wake():
+    """Tell the relay new events were committed, instead of waiting for the next poll."""
+    _wake.set()
+
+
+def relay_batch() -> int:
+    db = database.SessionLocal()
+    try:
+        events = (
+            db.query(models.OutboxEvent)
+            .filter(models.OutboxEvent.sent_at.is_(None))
+            .order_by(models.OutboxEvent.id)
+            .limit(OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not events:
+            db.commit()
+            return 0
+
+        delivered = publish_events(events)
+        if delivered:
+            db.query(models.OutboxEvent).filter(models.OutboxEvent.id.in_(delivered)).update(
+                {models.OutboxEvent.sent_at: datetime.utcnow()}, synchronize_session=False
+            )
+        db.commit()
+        print(f"📬 Outbox: published {len(delivered)}/{len(events)} events")
+        return len(events)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def purge_sent():
+    db = database.SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+        db.query(models.OutboxEvent).filter(models.OutboxEvent.sent_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_relay():
+    print("✅ Outbox relay started")
+    last_purge = 0.0
+    while not _stop.is_set():
+        try:
+            relayed = relay_batch()
+            if time.monotonic() - last_purge > 3600:
+                purge_sent()
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"🔥 Outbox relay error: {e}")
+            relayed = 0
+
+        # A full batch means there is more backlog, so go again straight away
+        if relayed < OUTBOX_BATCH_SIZE:
+            _wake.wait(OUTBOX_POLL_INTERVAL)
+            _wake.clear()
+    print("🔒 Outbox relay stopped")
+
+
+def start_outbox_relay():
+    global _thread
+    _stop.clear()
+    _thread = threading.Thread(target=run_relay, daemon=True)
+    _thread.start()
+
+
+def stop_outbox_relay():
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout=15)
+
+
+if __name__ == "__main__":
+    try:
+        run_relay()
+    except KeyboardInterrupt:
+        print("🛑 Outbox relay interrupted manually.")
@@ -0,0 +1,112 @@
+# outlet_directory.py
+#
+# Local replica of the outlet snapshot published by outlet-service (outlet_snapshot.py),
+# so outlet checks need no network hop. Codes the replica doesn't know are left to
+# the caller, which falls back to asking outlet-service over HTTP.
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Optional
+
+from redis_client import redis_client
+
+SNAPSHOT_KEY = "outlets:snapshot"
+VERSION_KEY = "outlets:snapshot:version"
+CHANGES_CHANNEL = "outlets:changes"
+
+# Outlet opening hours are local times; IST by default
+OUTLET_TZ = timezone(timedelta(minutes=int(os.getenv("OUTLET_UTC_OFFSET_MINUTES", 330))))
+
+
+def is_open(open_time: Optional[dtime], close_time: Optional[dtime], now: Optional[datetime] = None) -> bool:
+    """Outlets without hours are always open; hours may run past midnight."""
+    if open_time is None or close_time is None:
+        return True
+    current = (now or datetime.now(OUTLET_TZ)).astimezone(OUTLET_TZ).time()
+    if open_time <= close_time:
+        return open_time <= current < close_time
+    return current >= open_time or current < close_time
+
+
+class OutletDirectory:
+    def __init__(self):
+        self.version = 0
+        self._outlets = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hgetall(SNAPSHOT_KEY)
+        pipe.get(VERSION_KEY)
+        records, version = pipe.execute()
+        outlets = {code: self._parse(record) for code, record in records.items()}
+        with self._lock:
+            self._outlets = outlets
+            self.version = int(version or 0)
+        print(f"✅ Outlet directory loaded v{self.version} with {len(outlets)} outlets")
+
+    def apply(self, change: dict):
+        with self._lock:
+            if change["version"] <= self.version:
+                return
+            in_sequence = change["version"] == self.version + 1 and not change.get("reset")
+            if in_sequence:
+                for code in change.get("deletes", []):
+                    self._outlets.pop(code, None)
+                for code, record in change.get("upserts", {}).items():
+                    self._outlets[code] = self._parse(record)
+                self.version = change["version"]
+        if not in_sequence:
+            self.load()
+
+    @staticmethod
+    def _parse(record) -> dict:
+        if isinstance(record, str):
+            record = json.loads(record)
+        return {
+            "open_time": dtime.fromisoformat(record["open_time"]) if record.get("open_time") else None,
+            "close_time": dtime.fromisoformat(record["close_time"]) if record.get("close_time") else None,
+            "is_active": record.get("is_active", True),
+        }
+
+    def exists(self, code: str) -> Optional[bool]:
+        """True if the replica knows the code, None if the caller has to ask outlet-service."""
+        return True if code in self._outlets else None
+
+    def is_open_now(self, code: str) -> Optional[bool]:
+        """Whether the outlet takes orders right now, None if the replica doesn't know it."""
+        outlet = self._outlets.get(code)
+        if outlet is None:
+            return None
+        return outlet["is_active"] and is_open(outlet["open_time"], outlet["close_time"])
+
+
+def is_open_outlet(outlet: dict) -> bool:
+    """is_open_now for an outlet as returned by outlet-service's API."""
+    outlet = OutletDirectory._parse(outlet)
+    return outlet["is_active"] and is_open(outlet["open_time"], outlet["close_time"])
+
+
+outlet_directory = OutletDirectory()
+
+
+# ✅ Keep the replica in step with outlet-service's change stream
+def start_outlet_directory():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANGES_CHANNEL)
+                # Subscribe before loading so no change falls between the two
+                outlet_directory.load()
+                print(f"✅ Listening for outlet changes on: {CHANGES_CHANNEL}")
+                for message in pubsub.listen():
+                    outlet_directory.apply(json.loads(message["data"]))
+            except Exception as e:
+                print(f"🔥 Outlet directory listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
@@ -0,0 +1,11 @@
+import redis
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+redis_client = redis.Redis(
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", 6379)),
+    db=0,
+    decode_responses=True
+)
\ No newline at end of file
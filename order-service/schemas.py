@@ -49,3 +49,8 @@ class OrderOut(BaseModel):
 class UpdateOrderStatus(BaseModel):
     new_status: OrderStatus
 
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Dict, List
+
+import httpx
+from fastapi import HTTPException
+import http_client
+from outlet_directory import outlet_directory, is_open_outlet
+
+
+def _outlet_closed(outlet_code: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Outlet '{outlet_code}' is not taking orders right now")
+
+
+# ✅ Validate outlet_code with outlet service, and that it is open
+async def check_outlet(outlet_code: str, headers: Dict[str, str]) -> None:
+    # Known codes are answered by the local replica of outlet-service's snapshot
+    open_now = outlet_directory.is_open_now(outlet_code)
+    if open_now is not None:
+        if not open_now:
+            raise _outlet_closed(outlet_code)
+        return
+
+    try:
+        response = await http_client.get("outlet", f"/api/v1/outlet/{outlet_code}", hedge=True, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=503, detail="Failed to communicate with outlet service")
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=404, detail=f"Outlet with code '{outlet_code}' not found")
+    if not is_open_outlet(response.json()):
+        raise _outlet_closed(outlet_code)
+
+
+# pizza-service caps the number of ids per /batch call
+PIZZA_BATCH_SIZE = 100
+
+
+async def fetch_pizza_batch(pizza_ids: List[int], headers: Dict[str, str]) -> List[dict]:
+    params = {"ids": ",".join(str(pizza_id) for pizza_id in pizza_ids)}
+    try:
+        response = await http_client.get("pizza", "/api/v1/pizza/batch", hedge=True, params=params, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=503, detail="Failed to contact pizza service")
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=503, detail="Failed to fetch pizza details")
+    return response.json()
+
+
+# ✅ Price a whole basket with one /batch call per PIZZA_BATCH_SIZE distinct pizzas, keyed by pizza_id
+async def fetch_pizzas(pizza_ids: List[int], headers: Dict[str, str]) -> Dict[int, dict]:
+    unique_ids = list(dict.fromkeys(pizza_ids))
+    chunks = [unique_ids[i:i + PIZZA_BATCH_SIZE] for i in range(0, len(unique_ids), PIZZA_BATCH_SIZE)]
+    results = await asyncio.gather(*(fetch_pizza_batch(chunk, headers) for chunk in chunks))
+
+    pizzas = {pizza["id"]: pizza for batch in results for pizza in batch}
+    for pizza_id in unique_ids:
+        if pizza_id not in pizzas:
+            raise HTTPException(status_code=404, detail=f"Pizza with ID {pizza_id} not found")
+    return pizzas
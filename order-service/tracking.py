@@ -0,0 +1,126 @@
+# tracking.py
+#
+# Live order tracking. Status changes in this service and in delivery-service are
+# published on a per-order Redis channel; each worker holds one pattern subscription
+# and fans the events out to the SSE streams of the customers watching that order.
+# Work therefore grows with the number of status changes, not with how many clients
+# are watching or how often they would otherwise poll.
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import AsyncIterator
+
+from redis_client import redis_client
+
+# Shared with delivery-service/tracking.py
+TRACK_CHANNEL = "order:track:{order_uid}"
+TRACK_PATTERN = "order:track:*"
+
+# Seconds between keep-alive comments, so proxies don't close idle streams
+TRACK_KEEPALIVE = float(os.getenv("TRACK_KEEPALIVE", 15))
+TRACK_QUEUE_SIZE = int(os.getenv("TRACK_QUEUE_SIZE", 32))
+
+# After these the order can't change any more, so its streams are closed
+FINAL_STATUSES = {"DELIVERED", "CANCELLED"}
+
+
+def publish(order_uid: str, status: str, source: str = "order", **fields):
+    event = {"order_uid": order_uid, "source": source, "status": status,
+             "at": datetime.utcnow().isoformat(), **fields}
+    try:
+        redis_client.publish(TRACK_CHANNEL.format(order_uid=order_uid), json.dumps(event))
+    except Exception as e:
+        # Trackers miss this one; the status endpoints still have it
+        print(f"[Tracking] Redis publish failed: {e}")
+
+
+def _offer(queue: asyncio.Queue, data: str):
+    # A client that can't keep up loses its oldest events, never blocks the others
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(data)
+
+
+class Watchers:
+    """Queues of the open streams in this worker, by order_uid."""
+
+    def __init__(self):
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def add(self, order_uid: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=TRACK_QUEUE_SIZE)
+        with self._lock:
+            self._watchers.setdefault(order_uid, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def remove(self, order_uid: str, queue: asyncio.Queue):
+        with self._lock:
+            watchers = self._watchers.get(order_uid, set())
+            watchers.difference_update({w for w in watchers if w[1] is queue})
+            if not watchers:
+                self._watchers.pop(order_uid, None)
+
+    def dispatch(self, order_uid: str, data: str):
+        with self._lock:
+            watchers = list(self._watchers.get(order_uid, ()))
+        for loop, queue in watchers:
+            loop.call_soon_threadsafe(_offer, queue, data)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(len(watchers) for watchers in self._watchers.values())
+
+
+watchers = Watchers()
+
+
+def _sse(data: str, event: str = "status") -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def stream(order_uid: str, queue: asyncio.Queue, current: dict) -> AsyncIterator[str]:
+    """SSE stream for one order: its current status first, then every change.
+
+    The caller registers `queue` before reading `current`, so no change published in
+    between is missed; one that current already reflects is just sent again.
+    """
+    try:
+        yield _sse(json.dumps(current))
+        if current.get("status") in FINAL_STATUSES:
+            return
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), TRACK_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(data)
+            event = json.loads(data)
+            if event.get("source") == "order" and event.get("status") in FINAL_STATUSES:
+                return
+    finally:
+        watchers.remove(order_uid, queue)
+
+
+# ✅ One subscription per worker feeds every open tracking stream
+def start_tracking_listener():
+    prefix = TRACK_CHANNEL.format(order_uid="")
+
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(TRACK_PATTERN)
+                print(f"✅ Listening for order tracking events on: {TRACK_PATTERN}")
+                for message in pubsub.listen():
+                    watchers.dispatch(message["channel"][len(prefix):], message["data"])
+            except Exception as e:
+                print(f"🔥 Tracking listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
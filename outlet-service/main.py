@@ -1,13 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi_jwt_auth import AuthJWT
 import outlet_routes
 from config import Settings
 from middleware import AuthMiddleware
-app = FastAPI()
+import http_client
+import outlet_cache
+import outlet_snapshot
+from outlet_geo import start_geo_listener
+import database
+from token_cache import start_revocation_listener
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_revocation_listener()
+    outlet_cache.start_invalidation_listener()
+    start_geo_listener()
+    db = database.SessionLocal()
+    try:
+        outlet_snapshot.rebuild(db)
+    except Exception as e:
+        print(f"🔥 Outlet snapshot rebuild failed: {e}")
+    finally:
+        db.close()
+    await http_client.startup()
+    yield
+    await http_client.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @AuthJWT.load_config
 def get_config():
     return Settings()
 
 app.add_middleware(AuthMiddleware)
-app.include_router(outlet_routes.outlet_router)
\ No newline at end of file
+app.include_router(outlet_routes.outlet_router)
+
+
+# ✅ Circuit breaker state and counters per upstream dependency
+@app.get("/health/upstreams", tags=["health"])
+async def upstream_health():
+    return http_client.upstream_stats()
+
+
+# ✅ Outlet cache L1 / Redis hit, miss and stale counters for this worker
+@app.get("/health/cache", tags=["health"])
+async def cache_health():
+    return outlet_cache.cache_stats()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Time
+from sqlalchemy import Column, Integer, String, Boolean, Time, Float
 from database import Base
 
 class Outlet(Base):
@@ -13,3 +13,5 @@ class Outlet(Base):
     close_time = Column(Time, nullable=True)
     is_active = Column(Boolean, default=True)
     code = Column(String, unique=True, nullable=False, index=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
@@ -0,0 +1,242 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from redis_client import redis_client
+
+load_dotenv()
+
+OUTLET_CACHE_TTL = int(os.getenv("OUTLET_CACHE_TTL", 300))
+OUTLET_CACHE_STALE_TTL = int(os.getenv("OUTLET_CACHE_STALE_TTL", 600))
+# Loaders return None for things that don't exist; that answer is kept only briefly
+OUTLET_CACHE_MISS_TTL = int(os.getenv("OUTLET_CACHE_MISS_TTL", 30))
+OUTLET_CACHE_JITTER = float(os.getenv("OUTLET_CACHE_JITTER", 0.1))
+OUTLET_CACHE_LOCK_TTL = int(os.getenv("OUTLET_CACHE_LOCK_TTL", 10))
+OUTLET_CACHE_LOCK_WAIT = float(os.getenv("OUTLET_CACHE_LOCK_WAIT", 2.0))
+OUTLET_L1_SIZE = int(os.getenv("OUTLET_L1_SIZE", 1000))
+OUTLET_L1_TTL = int(os.getenv("OUTLET_L1_TTL", 30))
+OUTLET_CACHE_GZIP = os.getenv("OUTLET_CACHE_GZIP", "true").lower() == "true"
+GZIP_MIN_SIZE = 1024
+
+LOCK_KEY = "lock:{key}"
+# Every outlet-service worker evicts its L1 copy of keys published here
+INVALIDATION_CHANNEL = "cache:invalidate:outlet"
+
+_counters = {"l1_hit": 0, "hit": 0, "miss": 0, "stale": 0, "refresh": 0, "wait": 0}
+
+
+class LocalCache:
+    """Bounded LRU of Entry objects held by this worker.
+
+    Writes evict entries everywhere through INVALIDATION_CHANNEL; ``ttl`` only bounds
+    how long a missed invalidation message can go unnoticed.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data):
+        with self._lock:
+            self._entries[key] = (data, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+local_cache = LocalCache(OUTLET_L1_SIZE, OUTLET_L1_TTL)
+
+
+class Entry:
+    """A cached value and its JSON body, encoded once and shared by every request."""
+
+    __slots__ = ("body", "etag", "_data", "_gzipped")
+
+    def __init__(self, body: bytes, data=None):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._data = data
+        self._gzipped = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.body)
+        return self._data
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+
+def _envelope(body: str, fresh_for: Optional[float] = None, stale_for: Optional[int] = None) -> tuple:
+    """Redis value for a JSON body, and its TTL.
+
+    The value is "<fresh_until>|<body>", so a hit hands the body on without parsing
+    it. An entry is fresh for about OUTLET_CACHE_TTL seconds and may be served stale for
+    OUTLET_CACHE_STALE_TTL more while one request reloads it. Both are jittered so keys
+    written together don't all expire together.
+    """
+    if fresh_for is None:
+        fresh_for = OUTLET_CACHE_TTL * (1 + random.uniform(-OUTLET_CACHE_JITTER, OUTLET_CACHE_JITTER))
+    if stale_for is None:
+        stale_for = OUTLET_CACHE_STALE_TTL
+    return f"{time.time() + fresh_for:.3f}|{body}", int(fresh_for + stale_for)
+
+
+def peek(raw: Optional[str]) -> Optional[tuple]:
+    """(Entry, is_fresh) for a raw cache value, or None if there is nothing usable."""
+    if not raw:
+        return None
+    fresh_until, _, body = raw.partition("|")
+    try:
+        return Entry(body.encode()), float(fresh_until) > time.time()
+    except ValueError:
+        # Written in an older format; treat as a miss
+        return None
+
+
+def store(key: str, data, pipe=None) -> Entry:
+    body = json.dumps(data)
+    # A "not found" is not served stale, so a newly created item shows up within OUTLET_CACHE_MISS_TTL
+    payload, ttl = _envelope(body, OUTLET_CACHE_MISS_TTL, 0) if data is None else _envelope(body)
+    (pipe or redis_client).set(key, payload, ex=ttl)
+    entry = Entry(body.encode(), data)
+    local_cache.put(key, entry)
+    return entry
+
+
+def invalidate(*keys: str):
+    """Drop keys from Redis and from the L1 of every worker."""
+    redis_client.delete(*keys)
+    local_cache.evict(*keys)
+    try:
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+    except Exception as e:
+        # Other workers fall back to OUTLET_L1_TTL
+        print(f"[OutletCache] Invalidation publish failed: {e}")
+
+
+def count(name: str, n: int = 1):
+    _counters[name] += n
+
+
+def _acquire(key: str) -> bool:
+    return bool(redis_client.set(LOCK_KEY.format(key=key), "1", nx=True, ex=OUTLET_CACHE_LOCK_TTL))
+
+
+def _release(key: str):
+    redis_client.delete(LOCK_KEY.format(key=key))
+
+
+def _reload(key: str, loader: Callable) -> Entry:
+    try:
+        return store(key, loader())
+    finally:
+        _release(key)
+
+
+async def get_entry(key: str, loader: Callable) -> Entry:
+    """Serve key from the L1 or Redis, letting only one caller at a time run loader() for it.
+
+    loader() and the write-back are blocking DB and Redis calls, so they run in the
+    threadpool rather than on the event loop. Stale entries are returned to everyone
+    except the caller holding the lock, who reloads. On a cold miss the others wait up
+    to OUTLET_CACHE_LOCK_WAIT seconds for that reload before loading themselves.
+    """
+    entry = local_cache.get(key)
+    if entry is not None:
+        count("l1_hit")
+        return entry
+
+    cached = peek(redis_client.get(key))
+    if cached is not None:
+        entry, fresh = cached
+        if fresh:
+            count("hit")
+            local_cache.put(key, entry)
+            return entry
+        if not _acquire(key):
+            count("stale")
+            return entry
+        count("refresh")
+        return await run_in_threadpool(_reload, key, loader)
+
+    count("miss")
+    if _acquire(key):
+        return await run_in_threadpool(_reload, key, loader)
+
+    count("wait")
+    deadline = time.monotonic() + OUTLET_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        cached = peek(redis_client.get(key))
+        if cached is not None:
+            return cached[0]
+
+    # The lock holder is slow or gone; don't make this request fail for it
+    return await run_in_threadpool(lambda: store(key, loader()))
+
+
+def respond(entry: Entry, request: Request) -> Response:
+    """The cached body as-is: 304 if the client has it, gzipped if the client takes it."""
+    headers = {"ETag": entry.etag, "Vary": "Accept-Encoding"}
+    if entry.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    if OUTLET_CACHE_GZIP and len(entry.body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzipped, media_type="application/json", headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def cache_stats() -> dict:
+    return dict(_counters)
+
+
+# ✅ Evict L1 entries as soon as any worker invalidates them
+def start_invalidation_listener():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                print(f"✅ Listening for cache invalidations on: {INVALIDATION_CHANNEL}")
+                for message in pubsub.listen():
+                    local_cache.evict(*json.loads(message["data"]))
+            except Exception as e:
+                print(f"🔥 Invalidation listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
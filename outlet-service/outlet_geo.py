@@ -0,0 +1,175 @@
+# outlet_geo.py
+#
+# In-memory grid index of outlet coordinates for nearest-outlet lookups. Each worker
+# builds it from the DB on first use and rebuilds it after any outlet change, which
+# it hears about on outlet_snapshot's change channel (or directly, for its own writes).
+
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import List, Optional
+
+import database
+import schemas
+from models import Outlet
+from outlet_snapshot import CHANGES_CHANNEL
+from redis_client import redis_client
+
+# About 11 km per cell; searches widen ring by ring from the caller's cell
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", 0.1))
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Outlet opening hours are local times; IST by default
+OUTLET_TZ = timezone(timedelta(minutes=int(os.getenv("OUTLET_UTC_OFFSET_MINUTES", 330))))
+
+
+def is_open(open_time: Optional[dtime], close_time: Optional[dtime], now: Optional[datetime] = None) -> bool:
+    """Outlets without hours are always open; hours may run past midnight."""
+    if open_time is None or close_time is None:
+        return True
+    current = (now or datetime.now(OUTLET_TZ)).astimezone(OUTLET_TZ).time()
+    if open_time <= close_time:
+        return open_time <= current < close_time
+    return current >= open_time or current < close_time
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _cell(lat: float, lon: float) -> tuple:
+    return math.floor(lat / GEO_CELL_DEGREES), math.floor(lon / GEO_CELL_DEGREES)
+
+
+def _ring_cells(ci: int, cj: int, ring: int):
+    """Cells on the border of the square of half-width `ring` around (ci, cj)."""
+    if ring == 0:
+        yield ci, cj
+        return
+    for j in range(cj - ring, cj + ring + 1):
+        yield ci - ring, j
+        yield ci + ring, j
+    for i in range(ci - ring + 1, ci + ring):
+        yield i, cj - ring
+        yield i, cj + ring
+
+
+class OutletIndex:
+    """Active outlets with coordinates, bucketed into GEO_CELL_DEGREES grid cells."""
+
+    def __init__(self):
+        self._cells = {}
+        self._entries = []
+        self._bounds = None
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def rebuild(self):
+        db = database.SessionLocal()
+        try:
+            outlets = db.query(Outlet).filter(
+                Outlet.is_active.is_(True), Outlet.latitude.isnot(None), Outlet.longitude.isnot(None)
+            ).all()
+            entries = [
+                (outlet.latitude, outlet.longitude, outlet.open_time, outlet.close_time,
+                 json.loads(schemas.OutletOut.from_orm(outlet).json()))
+                for outlet in outlets
+            ]
+        finally:
+            db.close()
+
+        cells = {}
+        for entry in entries:
+            cells.setdefault(_cell(entry[0], entry[1]), []).append(entry)
+        bounds = None
+        if cells:
+            rows = [i for i, _ in cells]
+            cols = [j for _, j in cells]
+            bounds = (min(rows), max(rows), min(cols), max(cols))
+        self._cells, self._entries, self._bounds = cells, entries, bounds
+
+    def _ensure_fresh(self):
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    # Cleared first so a change that lands mid-rebuild triggers another one
+                    self._dirty = False
+                    try:
+                        self.rebuild()
+                    except Exception:
+                        # Still stale; the next lookup tries again
+                        self._dirty = True
+                        raise
+
+    def nearest(self, lat: float, lon: float, k: int = 5, open_now: bool = False,
+                max_km: Optional[float] = None) -> List[dict]:
+        self._ensure_fresh()
+        cells, entries, bounds = self._cells, self._entries, self._bounds
+        if not entries:
+            return []
+
+        now = datetime.now(OUTLET_TZ)
+        found = []
+
+        def consider(entry):
+            if open_now and not is_open(entry[2], entry[3], now):
+                return
+            distance = haversine_km(lat, lon, entry[0], entry[1])
+            if max_km is None or distance <= max_km:
+                found.append((distance, entry))
+
+        ci, cj = _cell(lat, lon)
+        max_ring = max(abs(ci - bounds[0]), abs(ci - bounds[1]), abs(cj - bounds[2]), abs(cj - bounds[3]))
+        for ring in range(max_ring + 1):
+            # Once the search square covers more cells than there are outlets, a plain scan is cheaper
+            if (2 * ring + 1) ** 2 > len(entries):
+                found = []
+                for entry in entries:
+                    consider(entry)
+                break
+
+            for cell in _ring_cells(ci, cj, ring):
+                for entry in cells.get(cell, ()):
+                    consider(entry)
+
+            # Anything outside this ring's square is at least `ring` cells away
+            cos_lat = math.cos(math.radians(min(89.0, abs(lat) + (ring + 1) * GEO_CELL_DEGREES)))
+            unseen_km = ring * GEO_CELL_DEGREES * KM_PER_DEGREE * cos_lat
+            if max_km is not None and unseen_km > max_km:
+                break
+            if len(found) >= k:
+                found.sort(key=lambda item: item[0])
+                if found[k - 1][0] <= unseen_km:
+                    break
+
+        found.sort(key=lambda item: item[0])
+        return [dict(entry[4], distance_km=round(distance, 3)) for distance, entry in found[:k]]
+
+
+outlet_index = OutletIndex()
+
+
+# ✅ Rebuild the index in every worker when any of them changes an outlet
+def start_geo_listener():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANGES_CHANNEL)
+                outlet_index.mark_dirty()
+                for _ in pubsub.listen():
+                    outlet_index.mark_dirty()
+            except Exception as e:
+                print(f"🔥 Outlet geo listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
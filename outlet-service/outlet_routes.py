@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Header
+from fastapi import APIRouter, HTTPException, Depends, status, Header, Request, Query
 from sqlalchemy.orm import Session
-from fastapi_jwt_auth import AuthJWT
+from middleware import get_current_user
 from typing import Optional
-import requests
-import os
+import httpx
 from dotenv import load_dotenv
-from redis_client import redis_client
+import http_client
+import outlet_cache
+import outlet_snapshot
+from outlet_geo import outlet_index
 import models, schemas, database
 from models import Outlet
 import json
@@ -13,16 +15,9 @@ load_dotenv()
 
 outlet_router = APIRouter(prefix="/api/v1/outlet", tags=["Outlet"])
 
-# ✅ Auth & Role utilities (kept inline as you requested)
-def jwt_required(Authorize: AuthJWT = Depends()):
-    try:
-        Authorize.jwt_required()
-        return Authorize.get_raw_jwt()
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized access")
-
+# ✅ Role utility, claims come from AuthMiddleware
 def role_required(required_role: str):
-    def checker(payload=Depends(jwt_required)):
+    def checker(payload=Depends(get_current_user)):
         role = payload.get("role")
         if role != required_role:
             raise HTTPException(
@@ -42,35 +37,57 @@ def create_outlet(
     db.add(new_outlet)
     db.commit()
     db.refresh(new_outlet)
-    redis_client.delete("all_outlets")
+    # Also drops a cached "not found" for the new code
+    outlet_cache.invalidate("all_outlets", f"outlet:{new_outlet.code}")
+    outlet_snapshot.publish_change(new_outlet.code, new_outlet)
+    outlet_index.mark_dirty()
     return new_outlet
 
 # ✅ Get all outlets (open access)
 @outlet_router.get("/", response_model=list[schemas.OutletOut])
-def list_outlets(
+async def list_outlets(
+    request: Request,
     db: Session = Depends(database.get_db),
 ):
-    cache_key = "all_outlets"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
-    outlets = db.query(Outlet).all()
-    # Use from_orm to convert models to dicts
-    data = [json.loads(schemas.OutletOut.from_orm(outlet).json()) for outlet in outlets]
+    def load():
+        outlets = db.query(Outlet).all()
+        # Use from_orm to convert models to dicts
+        return [json.loads(schemas.OutletOut.from_orm(outlet).json()) for outlet in outlets]
+
+    return outlet_cache.respond(await outlet_cache.get_entry("all_outlets", load), request)
+
+# ✅ Nearest outlets to a point, optionally only those open right now (open access)
+@outlet_router.get("/nearest", response_model=list[schemas.OutletNearOut])
+def nearest_outlets(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    open_now: bool = True,
+    max_km: Optional[float] = Query(None, gt=0),
+):
+    return outlet_index.nearest(lat, lon, k=k, open_now=open_now, max_km=max_km)
+
+
+def _outlet_entry(outlet_code: str, db: Session):
+    def load():
+        outlet = db.query(Outlet).filter(Outlet.code == outlet_code).first()
+        # Unknown codes are cached as null too, so bad codes don't hit the DB every time
+        return json.loads(schemas.OutletOut.from_orm(outlet).json()) if outlet else None
+
+    return outlet_cache.get_entry(f"outlet:{outlet_code}", load)
 
-    redis_client.set(cache_key, json.dumps(data), ex=300)  # Cache for 5 mins
-    return data
 
 # ✅ Get outlet by outlet_code
 @outlet_router.get("/{outlet_code}", response_model=schemas.OutletOut)
-def get_outlet(
+async def get_outlet(
     outlet_code: str,
+    request: Request,
     db: Session = Depends(database.get_db),
 ):
-    outlet = db.query(Outlet).filter(Outlet.code == outlet_code).first()
-    if not outlet:
+    entry = await _outlet_entry(outlet_code, db)
+    if entry.data is None:
         raise HTTPException(status_code=404, detail="Outlet not found with this code!!")
-    return outlet
+    return outlet_cache.respond(entry, request)
 
 # ✅ Update outlet (Admin only)
 @outlet_router.put("/{outlet_id}", response_model=schemas.OutletOut)
@@ -83,13 +100,16 @@ def update_outlet(
     outlet = db.query(Outlet).filter(Outlet.id == outlet_id).first()
     if not outlet:
         raise HTTPException(status_code=404, detail="Outlet not found")
+    old_code = outlet.code
 
     for field, value in outlet_data.dict().items():
         setattr(outlet, field, value)
 
     db.commit()
     db.refresh(outlet)
-    redis_client.delete("all_outlets")
+    outlet_cache.invalidate("all_outlets", f"outlet:{old_code}", f"outlet:{outlet.code}")
+    outlet_snapshot.publish_change(outlet.code, outlet, old_code=old_code)
+    outlet_index.mark_dirty()
     return outlet
 
 # ✅ Delete outlet (Admin only)
@@ -105,25 +125,25 @@ def delete_outlet(
 
     db.delete(outlet)
     db.commit()
-    redis_client.delete("all_outlets")
+    outlet_cache.invalidate("all_outlets", f"outlet:{outlet.code}")
+    outlet_snapshot.publish_change(outlet.code)
+    outlet_index.mark_dirty()
     return {"message": f"Outlet with ID {outlet_id} has been deleted successfully"}
 
 # ✅ Get available pizzas at outlet (auth optional, for inter-service)
 @outlet_router.get("/{outlet_code}/pizzas", response_model=list[dict])
-def get_outlet_pizzas(
+async def get_outlet_pizzas(
     outlet_code: str,
     db: Session = Depends(database.get_db),
     authorization: Optional[str] = Header(None, alias="Authorization")
 ):
-    outlet = db.query(Outlet).filter(Outlet.code == outlet_code).first()
-    if not outlet:
+    if (await _outlet_entry(outlet_code, db)).data is None:
         raise HTTPException(status_code=404, detail="Outlet not found")
 
     try:
         headers = {"Authorization": authorization} if authorization else {}
-        pizza_service_url = os.getenv("PIZZA_SERVICE_BASE_URL", "http://127.0.0.1:8005")
-        response = requests.get(f"{pizza_service_url}/api/v1/pizza/for-outlet/{outlet_code}", headers=headers, timeout=5)
+        response = await http_client.get("pizza", f"/api/v1/pizza/for-outlet/{outlet_code}", hedge=True, headers=headers)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Pizza service error: {str(e)}")
\ No newline at end of file
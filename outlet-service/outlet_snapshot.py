@@ -0,0 +1,54 @@
+# outlet_snapshot.py
+#
+# Publishes every outlet code with its opening hours to Redis, so order-service and
+# pizza-service can check outlets against a local replica (outlet_directory.py)
+# instead of calling this service. The hash holds the full snapshot; every change
+# bumps the version and is announced on the channel. A replica that sees a gap in
+# versions reloads the hash.
+
+import json
+from redis_client import redis_client
+from models import Outlet
+
+SNAPSHOT_KEY = "outlets:snapshot"
+VERSION_KEY = "outlets:snapshot:version"
+CHANGES_CHANNEL = "outlets:changes"
+
+
+def _record(outlet: Outlet) -> dict:
+    return {
+        "open_time": outlet.open_time.isoformat() if outlet.open_time else None,
+        "close_time": outlet.close_time.isoformat() if outlet.close_time else None,
+        "is_active": bool(outlet.is_active),
+    }
+
+
+def rebuild(db):
+    """Replace the snapshot with what is in the DB (run at startup)."""
+    records = {outlet.code: json.dumps(_record(outlet)) for outlet in db.query(Outlet).all()}
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(SNAPSHOT_KEY)
+    if records:
+        pipe.hset(SNAPSHOT_KEY, mapping=records)
+    pipe.incr(VERSION_KEY)
+    version = pipe.execute()[-1]
+    redis_client.publish(CHANGES_CHANNEL, json.dumps({"version": version, "reset": True}))
+    print(f"✅ Outlet snapshot v{version} published with {len(records)} outlets")
+
+
+def publish_change(code: str, outlet: Outlet = None, old_code: str = None):
+    """Write one outlet's change through to the snapshot; outlet=None removes the code."""
+    upserts = {code: _record(outlet)} if outlet is not None else {}
+    deletes = [c for c in (old_code, None if outlet is not None else code) if c and c not in upserts]
+    try:
+        pipe = redis_client.pipeline(transaction=True)
+        for c in deletes:
+            pipe.hdel(SNAPSHOT_KEY, c)
+        for c, record in upserts.items():
+            pipe.hset(SNAPSHOT_KEY, c, json.dumps(record))
+        pipe.incr(VERSION_KEY)
+        version = pipe.execute()[-1]
+        redis_client.publish(CHANGES_CHANNEL, json.dumps({"version": version, "upserts": upserts, "deletes": deletes}))
+    except Exception as e:
+        # Replicas fall back to HTTP for codes they don't know, and reload on the next version gap
+        print(f"🔥 Outlet snapshot update failed: {e}")
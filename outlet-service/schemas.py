@@ -12,6 +12,8 @@ class OutletCreate(BaseModel):
     close_time: Optional[time] = Field(None, example="22:00")
     is_active: bool = Field(default=True)
     code: str = Field(..., example="OUTLET_PUNE_001")
+    latitude: Optional[float] = Field(None, ge=-90, le=90, example=18.5204)
+    longitude: Optional[float] = Field(None, ge=-180, le=180, example=73.8567)
 
 # --- Schema for API response (includes ID) ---
 class OutletOut(OutletCreate):
@@ -19,3 +21,7 @@ class OutletOut(OutletCreate):
 
     class Config:
         orm_mode = True
+
+# --- Schema for nearest-outlet results ---
+class OutletNearOut(OutletOut):
+    distance_km: float
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from typing import Dict
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Upstream name -> base URL. Each upstream gets its own keep-alive connection pool.
+UPSTREAMS = {
+    "auth": os.getenv("USER_SERVICE_BASE_URL", "http://127.0.0.1:8001"),
+    "outlet": os.getenv("OUTLET_SERVICE_BASE_URL", "http://127.0.0.1:8003"),
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _setting(upstream: str, name: str, default):
+    # e.g. PIZZA_HTTP_TIMEOUT overrides HTTP_TIMEOUT for the pizza upstream only
+    return os.getenv(f"{upstream.upper()}_{name}", os.getenv(name, default))
+
+
+def _build_client(upstream: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=UPSTREAMS[upstream],
+        timeout=httpx.Timeout(float(_setting(upstream, "HTTP_TIMEOUT", 5))),
+        limits=httpx.Limits(
+            max_connections=int(_setting(upstream, "HTTP_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(_setting(upstream, "HTTP_MAX_KEEPALIVE", 20)),
+        ),
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    # Created lazily as well, so scripts that skip the app lifespan still work
+    if upstream not in _clients:
+        _clients[upstream] = _build_client(upstream)
+    return _clients[upstream]
+
+
+async def startup():
+    for upstream in UPSTREAMS:
+        get_client(upstream)
+
+
+async def shutdown():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+# --- Circuit breaker ---
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling an upstream whose circuit is open.
+
+    It is an ``httpx.HTTPError``, so callers map it to 503 like any other
+    connection failure - only without waiting for a timeout.
+    """
+
+
+class CircuitBreaker:
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.failure_threshold = int(_setting(upstream, "CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.slow_call_seconds = float(_setting(upstream, "CIRCUIT_SLOW_CALL_SECONDS", 2))
+        self.reset_seconds = float(_setting(upstream, "CIRCUIT_RESET_SECONDS", 30))
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counters = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "hedged": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            # Let a single probe through to test whether the upstream recovered
+            self.probe_in_flight = True
+            return True
+
+        self.counters["rejected"] += 1
+        return False
+
+    def record(self, duration: float, failed: bool):
+        self.counters["calls"] += 1
+        slow = duration >= self.slow_call_seconds
+        if slow:
+            self.counters["slow_calls"] += 1
+        if failed:
+            self.counters["failures"] += 1
+
+        if failed or slow:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+        else:
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+        self.probe_in_flight = False
+
+    def _open(self):
+        if self.state != self.OPEN:
+            self.counters["opened"] += 1
+            print(f"⚠️ Circuit for {self.upstream} opened after {self.consecutive_failures} failed or slow calls")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            **self.counters,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    if upstream not in _breakers:
+        _breakers[upstream] = CircuitBreaker(upstream)
+    return _breakers[upstream]
+
+
+def upstream_stats() -> dict:
+    return {upstream: get_breaker(upstream).snapshot() for upstream in UPSTREAMS}
+
+
+async def _hedged_get(upstream: str, url: str, delay: float, **kwargs) -> httpx.Response:
+    # Send a second identical request if the first has not answered within `delay`
+    client = get_client(upstream)
+    first = asyncio.ensure_future(client.get(url, **kwargs))
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+
+        get_breaker(upstream).counters["hedged"] += 1
+        tasks.append(asyncio.ensure_future(client.get(url, **kwargs)))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Whichever request lost the race (or all of them, if we were cancelled)
+        for task in tasks:
+            task.cancel()
+
+
+# ✅ GET through the upstream's circuit breaker; hedge=True only for idempotent reads
+async def get(upstream: str, url: str, hedge: bool = False, **kwargs) -> httpx.Response:
+    breaker = get_breaker(upstream)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit for {upstream} service is open")
+
+    hedge_delay = float(_setting(upstream, "HTTP_HEDGE_DELAY", 0))
+    start = time.monotonic()
+    try:
+        if hedge and hedge_delay > 0:
+            response = await _hedged_get(upstream, url, hedge_delay, **kwargs)
+        else:
+            response = await get_client(upstream).get(url, **kwargs)
+    except httpx.HTTPError:
+        breaker.record(time.monotonic() - start, failed=True)
+        raise
+    except asyncio.CancelledError:
+        breaker.probe_in_flight = False
+        raise
+
+    breaker.record(time.monotonic() - start, failed=response.status_code >= 500)
+    return response
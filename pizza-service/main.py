@@ -1,9 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi_jwt_auth import AuthJWT
 import pizza_routes
 from config import Settings
 from middleware import AuthMiddleware
-app = FastAPI()
+import http_client
+import menu_cache
+from token_cache import start_revocation_listener
+from outlet_directory import start_outlet_directory
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_revocation_listener()
+    start_outlet_directory()
+    menu_cache.start_invalidation_listener()
+    await http_client.startup()
+    yield
+    await http_client.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 
 @AuthJWT.load_config
@@ -11,4 +27,16 @@ def get_config():
     return Settings()
 
 app.add_middleware(AuthMiddleware)
-app.include_router(pizza_routes.pizza_router)
\ No newline at end of file
+app.include_router(pizza_routes.pizza_router)
+
+
+# ✅ Circuit breaker state and counters per upstream dependency
+@app.get("/health/upstreams", tags=["health"])
+async def upstream_health():
+    return http_client.upstream_stats()
+
+
+# ✅ Menu cache L1 / Redis hit, miss and stale counters for this worker
+@app.get("/health/cache", tags=["health"])
+async def cache_health():
+    return menu_cache.cache_stats()
@@ -0,0 +1,84 @@
+# outlet_directory.py
+#
+# Local replica of the outlet snapshot published by outlet-service (outlet_snapshot.py),
+# so outlet checks need no network hop. Codes the replica doesn't know are left to
+# the caller, which falls back to asking outlet-service over HTTP.
+
+import json
+import threading
+import time
+from datetime import time as dtime
+from typing import Optional
+
+from redis_client import redis_client
+
+SNAPSHOT_KEY = "outlets:snapshot"
+VERSION_KEY = "outlets:snapshot:version"
+CHANGES_CHANNEL = "outlets:changes"
+
+class OutletDirectory:
+    def __init__(self):
+        self.version = 0
+        self._outlets = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hgetall(SNAPSHOT_KEY)
+        pipe.get(VERSION_KEY)
+        records, version = pipe.execute()
+        outlets = {code: self._parse(record) for code, record in records.items()}
+        with self._lock:
+            self._outlets = outlets
+            self.version = int(version or 0)
+        print(f"✅ Outlet directory loaded v{self.version} with {len(outlets)} outlets")
+
+    def apply(self, change: dict):
+        with self._lock:
+            if change["version"] <= self.version:
+                return
+            in_sequence = change["version"] == self.version + 1 and not change.get("reset")
+            if in_sequence:
+                for code in change.get("deletes", []):
+                    self._outlets.pop(code, None)
+                for code, record in change.get("upserts", {}).items():
+                    self._outlets[code] = self._parse(record)
+                self.version = change["version"]
+        if not in_sequence:
+            self.load()
+
+    @staticmethod
+    def _parse(record) -> dict:
+        if isinstance(record, str):
+            record = json.loads(record)
+        return {
+            "open_time": dtime.fromisoformat(record["open_time"]) if record.get("open_time") else None,
+            "close_time": dtime.fromisoformat(record["close_time"]) if record.get("close_time") else None,
+            "is_active": record.get("is_active", True),
+        }
+
+    def exists(self, code: str) -> Optional[bool]:
+        """True if the replica knows the code, None if the caller has to ask outlet-service."""
+        return True if code in self._outlets else None
+
+
+outlet_directory = OutletDirectory()
+
+
+# ✅ Keep the replica in step with outlet-service's change stream
+def start_outlet_directory():
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANGES_CHANNEL)
+                # Subscribe before loading so no change falls between the two
+                outlet_directory.load()
+                print(f"✅ Listening for outlet changes on: {CHANGES_CHANNEL}")
+                for message in pubsub.listen():
+                    outlet_directory.apply(json.loads(message["data"]))
+            except Exception as e:
+                print(f"🔥 Outlet directory listener error, reconnecting: {e}")
+                time.sleep(5)
+
+    threading.Thread(target=listen, daemon=True).start()
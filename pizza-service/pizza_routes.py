@@ -1,31 +1,44 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Header
+from fastapi import APIRouter, HTTPException, Depends, status, Header, Query, Request
 from sqlalchemy.orm import Session
 import models, schemas, database
-from fastapi_jwt_auth import AuthJWT
-import requests
+from middleware import get_current_user
+import httpx
 from typing import Optional
 from fastapi.encoders import jsonable_encoder
-import os
 from dotenv import load_dotenv
 load_dotenv()
 from redis_client import redis_client
-import json
+import http_client
+import menu_cache
+from outlet_directory import outlet_directory
 
 pizza_router = APIRouter(prefix="/api/v1/pizza", tags=["pizza"])
 
+MAX_BATCH_SIZE = 100
+
+
+# ✅ Validate outlet_code, from the local outlet replica when it knows the code
+async def check_outlet(outlet_code: str, headers: dict) -> None:
+    if outlet_directory.exists(outlet_code):
+        return
+
+    try:
+        response = await http_client.get("outlet", f"/api/v1/outlet/{outlet_code}", hedge=True, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=503, detail="Failed to communicate with outlet service")
+    if response.status_code != 200:
+        raise HTTPException(status_code=404, detail=f"Outlet with code '{outlet_code}' not found")
+
+
 # ✅ Create a pizza
 @pizza_router.post("/create", response_model=schemas.PizzaResponse, status_code=status.HTTP_201_CREATED)
 async def create_pizza(
         pizza: schemas.PizzaCreate,
         db: Session = Depends(database.get_db),
-        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(get_current_user),
         Authorization: Optional[str] = Header(None)
 ):
-    try:
-        Authorize.jwt_required()
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+    role = user.get("role")
 
     if role not in ["ADMIN", "STAFF"]:
         raise HTTPException(status_code=403, detail="Only Admin and Staff can create pizzas")
@@ -35,15 +48,7 @@ async def create_pizza(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pizza already exists")
 
     if pizza.outlet_code:
-        outlet_service_url = os.getenv("OUTLET_SERVICE_BASE_URL", "http://127.0.0.1:8003") + f"/api/v1/outlet/{pizza.outlet_code}"
-        try:
-            headers = {"Authorization": f"{Authorization}"}
-            response = requests.get(outlet_service_url, headers=headers, timeout=5)
-            print(response)
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail=f"Outlet with code '{pizza.outlet_code}' not found")
-        except requests.exceptions.RequestException:
-            raise HTTPException(status_code=503, detail="Failed to communicate with outlet service")
+        await check_outlet(pizza.outlet_code, {"Authorization": f"{Authorization}"})
 
     new_pizza = models.Pizza(
         name=pizza.name,
@@ -58,9 +63,11 @@ async def create_pizza(
     db.commit()
     db.refresh(new_pizza)
 
-    redis_client.delete("all_pizzas")
+    # Also drops a cached "not found" for the new id
+    keys = ["all_pizzas", f"pizza:{new_pizza.id}"]
     if pizza.outlet_code:
-        redis_client.delete(f"outlet_pizzas:{pizza.outlet_code}")
+        keys.append(f"outlet_pizzas:{pizza.outlet_code}")
+    menu_cache.invalidate(*keys)
 
     return jsonable_encoder(new_pizza)
 
@@ -68,60 +75,116 @@ async def create_pizza(
 # ✅ Get all pizzas
 @pizza_router.get("/", response_model=list[schemas.PizzaResponse])
 async def get_pizzas(
+    request: Request,
     db: Session = Depends(database.get_db),
     authorization: Optional[str] = Header(None)
 ):
-    cache_key = "all_pizzas"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
-
-    pizzas = db.query(models.Pizza).all()
-    data = [
-        schemas.PizzaResponse(
-            id=pizza.id,
-            name=pizza.name,
-            description=pizza.description,
-            price=pizza.price,
-            size=pizza.size.value,
-            availability=pizza.availability,
-            outlet_code=pizza.outlet_code
-        ).dict()
-        for pizza in pizzas
-    ]
-
-    redis_client.set(cache_key, json.dumps(data), ex=300)  # Cache for 5 mins
-    return data
+    def load():
+        pizzas = db.query(models.Pizza).all()
+        return [
+            schemas.PizzaResponse(
+                id=pizza.id,
+                name=pizza.name,
+                description=pizza.description,
+                price=pizza.price,
+                size=pizza.size.value,
+                availability=pizza.availability,
+                outlet_code=pizza.outlet_code
+            ).dict()
+            for pizza in pizzas
+        ]
+
+    return menu_cache.respond(await menu_cache.get_entry("all_pizzas", load), request)
+
+
+# ✅ Get several pizzas by ID in one call (e.g. /batch?ids=1,2,3)
+@pizza_router.get("/batch", response_model=list[schemas.PizzaResponse])
+async def get_pizzas_batch(
+    ids: str = Query(..., example="1,2,3"),
+    db: Session = Depends(database.get_db),
+    Authorization: Optional[str] = Header(None)
+):
+    try:
+        pizza_ids = list(dict.fromkeys(int(pizza_id) for pizza_id in ids.split(",") if pizza_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be a comma separated list of integers")
+
+    if not pizza_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one pizza id is required")
+    if len(pizza_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BATCH_SIZE} pizza ids are allowed")
+
+    # Serve hits from the L1, then the per-pizza cache keys with a single MGET
+    found = {}
+    for pizza_id in pizza_ids:
+        entry = menu_cache.local_cache.get(f"pizza:{pizza_id}")
+        if entry is not None:
+            found[pizza_id] = entry.data
+    menu_cache.count("l1_hit", len(found))
+
+    missing = []
+    remote = [pizza_id for pizza_id in pizza_ids if pizza_id not in found]
+    if remote:
+        # (stale entries are good enough here; the next single lookup refreshes them)
+        for pizza_id, raw in zip(remote, redis_client.mget([f"pizza:{pizza_id}" for pizza_id in remote])):
+            cached = menu_cache.peek(raw)
+            if cached is not None:
+                found[pizza_id] = cached[0].data
+            else:
+                missing.append(pizza_id)
+        menu_cache.count("hit", len(remote) - len(missing))
+        menu_cache.count("miss", len(missing))
+
+    # Fill misses with one IN (...) query and write them back in one pipeline
+    if missing:
+        pizzas = db.query(models.Pizza).filter(models.Pizza.id.in_(missing)).all()
+        pipe = redis_client.pipeline(transaction=False)
+        for pizza in pizzas:
+            data = schemas.PizzaResponse(
+                id=pizza.id,
+                name=pizza.name,
+                description=pizza.description,
+                price=pizza.price,
+                size=pizza.size.value,
+                availability=pizza.availability,
+                outlet_code=pizza.outlet_code
+            ).dict()
+            found[pizza.id] = data
+            menu_cache.store(f"pizza:{pizza.id}", data, pipe)
+        pipe.execute()
+
+    # Unknown ids are left out, callers compare against what they asked for
+    return [found[pizza_id] for pizza_id in pizza_ids if found.get(pizza_id) is not None]
 
 
 # ✅ Get a specific pizza by ID
 @pizza_router.get("/{pizza_id}", response_model=schemas.PizzaResponse)
 async def get_pizza(
     pizza_id: int,
+    request: Request,
     db: Session = Depends(database.get_db),
     Authorization: Optional[str] = Header(None)
 ):
-    cache_key = f"pizza:{pizza_id}"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
-
-    pizza = db.query(models.Pizza).filter(models.Pizza.id == pizza_id).first()
-    if not pizza:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pizza not found")
+    def load():
+        pizza = db.query(models.Pizza).filter(models.Pizza.id == pizza_id).first()
+        # Unknown ids are cached as null too, so concurrent lookups of a bad id don't all hit the DB
+        if not pizza:
+            return None
 
-    data = schemas.PizzaResponse(
-        id=pizza.id,
-        name=pizza.name,
-        description=pizza.description,
-        price=pizza.price,
-        size=pizza.size.value,
-        availability=pizza.availability,
-        outlet_code=pizza.outlet_code
-    ).dict()
+        return schemas.PizzaResponse(
+            id=pizza.id,
+            name=pizza.name,
+            description=pizza.description,
+            price=pizza.price,
+            size=pizza.size.value,
+            availability=pizza.availability,
+            outlet_code=pizza.outlet_code
+        ).dict()
 
-    redis_client.set(cache_key, json.dumps(data), ex=300)
-    return data
+    entry = await menu_cache.get_entry(f"pizza:{pizza_id}", load)
+    if entry.data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pizza not found")
+    return menu_cache.respond(entry, request)
 
 # ✅ update a specific pizza by ID
 @pizza_router.put("/{pizza_id}", response_model=schemas.PizzaResponse)
@@ -130,17 +193,13 @@ async def update_pizza(
     pizza_data: schemas.PizzaUpdate,
     db: Session = Depends(database.get_db),
     authorization: Optional[str] = Header(None),
-    Authorize: AuthJWT = Depends(),
+    user: dict = Depends(get_current_user),
 
 ):
     if not authorization:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization token required")
 
-    try:
-        Authorize.jwt_required()
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    role = user.get("role")
 
     if role not in ["ADMIN", "STAFF"]:
         raise HTTPException(status_code=403, detail="Only Admin and Staff can update pizzas")
@@ -161,10 +220,10 @@ async def update_pizza(
     db.refresh(pizza)
 
     # Invalidate cache
-    redis_client.delete("all_pizzas")
-    redis_client.delete(f"pizza:{pizza_id}")
+    keys = ["all_pizzas", f"pizza:{pizza_id}"]
     if pizza.outlet_code:
-        redis_client.delete(f"outlet_pizzas:{pizza.outlet_code}")
+        keys.append(f"outlet_pizzas:{pizza.outlet_code}")
+    menu_cache.invalidate(*keys)
 
     return schemas.PizzaResponse(
         id=pizza.id,
@@ -182,16 +241,12 @@ async def delete_pizza(
     pizza_id: int,
     db: Session = Depends(database.get_db),
     authorization: Optional[str] = Header(None),
-    Authorize: AuthJWT = Depends(),
+    user: dict = Depends(get_current_user),
 ):
     if not authorization:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization token required")
 
-    try:
-        Authorize.jwt_required()
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    role = user.get("role")
 
     if role not in ["ADMIN", "STAFF"]:
         raise HTTPException(status_code=403, detail="Only Admin and Staff can Delete pizzas")
@@ -204,10 +259,10 @@ async def delete_pizza(
     db.commit()
 
     # Invalidate cache
-    redis_client.delete("all_pizzas")
-    redis_client.delete(f"pizza:{pizza_id}")
+    keys = ["all_pizzas", f"pizza:{pizza_id}"]
     if pizza.outlet_code:
-        redis_client.delete(f"outlet_pizzas:{pizza.outlet_code}")
+        keys.append(f"outlet_pizzas:{pizza.outlet_code}")
+    menu_cache.invalidate(*keys)
 
     return {"message": f"Pizza with ID {pizza_id} has been deleted successfully"}
 
@@ -215,47 +270,29 @@ async def delete_pizza(
 @pizza_router.get("/for-outlet/{outlet_code}", response_model=list[schemas.PizzaResponse])
 async def get_pizzas_for_outlet(
     outlet_code: str,
+    request: Request,
     db: Session = Depends(database.get_db),
     Authorization: Optional[str] = Header(None),
-    Authorize: AuthJWT = Depends()
+    user: dict = Depends(get_current_user)
 ):
-    try:
-        Authorize.jwt_required()
-        role = Authorize.get_raw_jwt().get("role")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-    outlet_service_url = os.getenv("OUTLET_SERVICE_BASE_URL",
-                                   "http://127.0.0.1:8003") + f"/api/v1/outlet/{outlet_code}"
-    try:
-        headers = {"Authorization": Authorization}
-        response = requests.get(outlet_service_url, headers=headers, timeout=5)
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"Outlet with code '{outlet_code}' not found")
-    except requests.exceptions.RequestException:
-        raise HTTPException(status_code=503, detail="Failed to communicate with outlet service")
-
-    cache_key = f"outlet_pizzas:{outlet_code}"
-    cached = redis_client.get(cache_key)
-    if cached:
-        return json.loads(cached)
-
-    pizzas = db.query(models.Pizza).filter(
-        (models.Pizza.outlet_code == outlet_code) | (models.Pizza.outlet_code.is_(None))
-    ).all()
-
-    data = [
-        schemas.PizzaResponse(
-            id=pizza.id,
-            name=pizza.name,
-            description=pizza.description,
-            price=pizza.price,
-            size=pizza.size.value,
-            availability=pizza.availability,
-            outlet_code=pizza.outlet_code
-        ).dict()
-        for pizza in pizzas
-    ]
-
-    redis_client.set(cache_key, json.dumps(data), ex=300)
-    return data
\ No newline at end of file
+    await check_outlet(outlet_code, {"Authorization": Authorization})
+
+    def load():
+        pizzas = db.query(models.Pizza).filter(
+            (models.Pizza.outlet_code == outlet_code) | (models.Pizza.outlet_code.is_(None))
+        ).all()
+
+        return [
+            schemas.PizzaResponse(
+                id=pizza.id,
+                name=pizza.name,
+                description=pizza.description,
+                price=pizza.price,
+                size=pizza.size.value,
+                availability=pizza.availability,
+                outlet_code=pizza.outlet_code
+            ).dict()
+            for pizza in pizzas
+        ]
+
+    return menu_cache.respond(await menu_cache.get_entry(f"outlet_pizzas:{outlet_code}", load), request)
\ No newline at end of file